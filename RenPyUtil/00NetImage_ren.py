@@ -2,18 +2,25 @@
 python early:
 """
 
+import json
+import time
+import heapq
 import logging
-import requests
+import itertools
+import threading
+import weakref
 import renpy.exports as renpy  # type: ignore
 import renpy.config as config  # type: ignore
-from renpy.display.im import Data  # type: ignore
+import renpy.display.im as im  # type: ignore
+import renpy.display.scale as scale  # type: ignore
+import renpy.display.pgrender as pgrender  # type: ignore
 from renpy.defaultstore import Transform  # type: ignore
 
 from pathlib import Path
-from hashlib import md5
-
-if not (renpy.windows or renpy.linux):
-    import appdirs
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import md5, sha256
+from urllib.parse import urljoin, urlsplit
 
 logger = logging.getLogger("NetImage")
 logger.setLevel(logging.DEBUG)
@@ -24,22 +31,883 @@ if not logger.handlers:
     logger.addHandler(handler)
 
 
+def _cache_root():
+    if renpy.windows or renpy.linux:
+        return Path(config.gamedir)
+
+    import appdirs
+    return Path(appdirs.user_data_dir(appname=config.name))
+
+
+class NetImageCache:
+    """NetImage 磁盘缓存。
+
+    使用索引文件记录每张图片的文件名、大小与最近使用时间，
+    超出容量或长期未使用的图片按最近最少使用（LRU）策略淘汰。
+    缓存目录与索引在第一次使用时才会创建和读取。
+    """
+
+    INDEX_NAME = "index.json"
+
+    def __init__(self, cache_dir: Path, max_size=512 * 1024 * 1024, max_unused_age=30 * 24 * 60 * 60):
+        """
+        :param cache_dir: 缓存目录
+        :param max_size: 缓存总大小上限（字节）
+        :param max_unused_age: 图片超过该秒数未被使用时淘汰，为 None 时不按时间淘汰
+        """
+
+        self.cache_dir = cache_dir
+        self.meta_dir = cache_dir / "meta"
+        self.index_path = cache_dir / self.INDEX_NAME
+        self.max_size = max_size
+        self.max_unused_age = max_unused_age
+
+        self._lock = threading.RLock()
+        self._dirty = False
+        self._index: OrderedDict[str, dict] | None = None
+        self._size = 0
+
+    @property
+    def _entries(self):
+        """按最近使用时间排序的索引，最久未使用的图片位于最前。"""
+
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._load()
+        return self._index
+
+    @property
+    def size(self):
+        """缓存总大小（字节）。"""
+
+        self._entries  # 确保索引已加载
+        return self._size
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def meta_path(self, key: str):
+        return self.meta_dir / f"{key}.json"
+
+    def version(self, key: str):
+        """返回已缓存图片的写入时间，用于区分同一文件的不同版本。"""
+
+        entry = self._entries.get(key)
+        return entry.get("added", 0) if entry else 0
+
+    def touch(self, key: str):
+        """记录一次图片使用。"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["last_used"] = time.time()
+            self._entries.move_to_end(key)
+            self._dirty = True
+
+    def add(self, key: str, name: str, size: int):
+        """登记一张已写入缓存目录的图片，并在超出容量时淘汰旧图片。"""
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old["size"]
+            now = time.time()
+            self._entries[key] = {"name": name, "size": size, "added": now, "last_used": now}
+            self._size += size
+            self._dirty = True
+
+            while self._size > self.max_size and len(self._entries) > 1:
+                self._evict(next(iter(self._entries)))
+
+            self.save()
+
+    def remove(self, key: str):
+        """从缓存中删除一张图片。"""
+
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+                self.save()
+
+    def prune(self):
+        """淘汰长期未使用的图片。"""
+
+        if self.max_unused_age is None:
+            return
+
+        deadline = time.time() - self.max_unused_age
+        with self._lock:
+            while self._entries:
+                key, entry = next(iter(self._entries.items()))
+                if entry["last_used"] >= deadline:
+                    break
+                self._evict(key)
+            self.save()
+
+    def save(self):
+        """若索引有变化，则写入索引文件。"""
+
+        with self._lock:
+            if self._index is None or not self._dirty:
+                return
+            tmp_path = self.index_path.with_suffix(".tmp")
+            try:
+                tmp_path.write_text(json.dumps(self._entries), encoding="utf-8")
+                tmp_path.replace(self.index_path)
+            except OSError as e:
+                logger.warning("无法写入缓存索引: %s", e)
+            else:
+                self._dirty = False
+
+    def _evict(self, key: str):
+        entry = self._entries.pop(key)
+        self._size -= entry["size"]
+        self._dirty = True
+        for path in (self.cache_dir / entry["name"], self.meta_path(key)):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning("无法删除缓存文件 [%s]: %s", path.name, e)
+        logger.debug("已淘汰缓存图片: %s", entry["name"])
+
+    def _load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.meta_dir.mkdir(exist_ok=True)
+
+        self._index = self._load_index()
+        self._size = sum(entry["size"] for entry in self._index.values())
+        self.prune()
+
+    def _load_index(self):
+        try:
+            entries = json.loads(self.index_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return self._rebuild_index()
+        except (OSError, ValueError) as e:
+            logger.warning("缓存索引损坏，重新扫描缓存目录: %s", e)
+            return self._rebuild_index()
+
+        return OrderedDict(sorted(entries.items(), key=lambda item: item[1]["last_used"]))
+
+    def _rebuild_index(self):
+        """扫描缓存目录重建索引，仅在索引文件缺失或损坏时使用。"""
+
+        entries = []
+        for path in self.cache_dir.iterdir():
+            if path.is_file() and path.name != self.INDEX_NAME and path.suffix not in (".tmp", ".part"):
+                stat = path.stat()
+                entries.append((path.stem, {"name": path.name, "size": stat.st_size, "last_used": stat.st_mtime}))
+        entries.sort(key=lambda item: item[1]["last_used"])
+
+        self._dirty = True
+        return OrderedDict(entries)
+
+
+class NetImageFile(im.ImageBase):
+    """从缓存文件加载的图片，可在加载时等比缩小到不超过指定尺寸。"""
+
+    def __init__(self, filename: str, thumbnail=None, version=0, key=None, **properties):
+        """
+        :param filename: 图片文件的绝对路径
+        :param thumbnail: 可选的最大尺寸 `(宽, 高)`
+        :param version: 文件版本，文件内容更新后需使用新的版本，以免读到 Ren'Py 图片缓存中的旧图
+        :param key: 图片在磁盘缓存中的键，文件丢失或损坏时用于重新下载，不参与图片的标识
+        """
+
+        super().__init__(filename, thumbnail, version, **properties)
+        self.filename = filename
+        self.thumbnail = thumbnail
+        self.key = key
+
+    def load(self):
+        try:
+            with open(self.filename, "rb") as f:
+                surf = pgrender.load_image(f, self.filename)
+        except Exception as e:
+            # 缓存文件在游戏外被删除或已损坏，重新下载，在此之前显示一张透明图片
+            logger.warning("无法读取缓存图片 [%s]: %s", self.filename, e)
+            if self.key is not None:
+                NetImage._cache_file_lost(self.key)
+            return pgrender.surface((1, 1), True)
+
+        if self.thumbnail:
+            width, height = surf.get_size()
+            ratio = min(self.thumbnail[0] / width, self.thumbnail[1] / height)
+            if ratio < 1:
+                surf = scale.smoothscale(surf, (max(1, round(width * ratio)), max(1, round(height * ratio))))
+
+        return surf
+
+    def predict_files(self):
+        return []
+
+
+class NetImageSessionPool:
+    """线程安全的 HTTP 会话池。
+
+    每个会话为每个主机维护 keep-alive 连接池，并在连接错误或服务器错误时按指数退避重试。
+    会话在工作线程间复用，同一时间只被一个线程使用。
+    """
+
+    def __init__(
+        self,
+        pool_connections=10,
+        pool_maxsize=2,
+        retries=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+    ):
+        """
+        :param pool_connections: 每个会话缓存连接池的主机数
+        :param pool_maxsize: 每个主机保持的最大连接数
+        :param retries: 最大重试次数
+        :param backoff_factor: 重试退避系数，第 n 次重试前等待 backoff_factor * 2 ** (n - 1) 秒
+        :param status_forcelist: 需要重试的 HTTP 状态码
+        """
+
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+
+        self._lock = threading.Lock()
+        self._idle = []
+
+    @contextmanager
+    def session(self):
+        """借出一个会话，使用完毕后自动归还。"""
+
+        with self._lock:
+            session = self._idle.pop() if self._idle else None
+        if session is None:
+            session = self._create()
+
+        try:
+            yield session
+        finally:
+            with self._lock:
+                self._idle.append(session)
+
+    def close(self):
+        """关闭所有空闲会话及其连接。"""
+
+        with self._lock:
+            sessions, self._idle = self._idle, []
+        for session in sessions:
+            session.close()
+
+    def _create(self):
+        # 推迟到第一次下载时才导入 requests，以免拖慢游戏启动
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.status_forcelist,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry,
+        )
+
+        session = requests.Session()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+
+class _DownloadJob:
+    """下载任务，仅由 `NetImageScheduler` 内部使用。
+
+    同一 URL 只有一个任务，所有等待该 URL 的 NetImage 都登记为等待者，下载完成后一并通知。
+    """
+
+    def __init__(self, net_image: "NetImage", priority: int):
+        self.key = net_image.md5
+        self.host = urlsplit(net_image.url).netloc
+        self.priority = priority
+        self.started = False
+        self.cancelled = False
+        self.waiters: dict[int, weakref.ref] = {}
+        self.add(net_image)
+
+    def add(self, net_image: "NetImage"):
+        self.waiters[id(net_image)] = weakref.ref(net_image)
+
+    def discard(self, net_image: "NetImage"):
+        ref = self.waiters.get(id(net_image))
+        if ref is not None and ref() is net_image:
+            del self.waiters[id(net_image)]
+
+    def alive(self) -> list["NetImage"]:
+        """返回仍被引用的等待者。"""
+
+        waiters = [ref() for ref in list(self.waiters.values())]
+        return [net_image for net_image in waiters if net_image is not None]
+
+    def report_progress(self, downloaded, total):
+        for net_image in self.alive():
+            net_image._set_progress(downloaded, total)
+
+
+class NetImageScheduler:
+    """NetImage 下载调度器。
+
+    限制同时进行的下载数和每个主机的并发连接数，
+    优先下载正在显示的图片，并跳过已被取消或不再被引用的图片。
+    同一 URL 的多个请求会合并为一次下载。实际的传输由下载后端完成。
+    """
+
+    REFRESH = -10
+    PREFETCH = -5
+    PRELOAD = 0
+    ON_SCREEN = 10
+
+    def __init__(self, max_workers=4, max_per_host=2, backend=None):
+        """
+        :param max_workers: 最大同时下载数
+        :param max_per_host: 每个主机的最大并发连接数
+        :param backend: 下载后端，默认为 `NetImageThreadBackend`
+        """
+
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.backend = backend or NetImageThreadBackend()
+
+        self._lock = threading.Lock()
+        self._heap = []
+        self._jobs: dict[str, _DownloadJob] = {}
+        self._host_active: dict[str, int] = {}
+        self._active = 0
+        self._seq = itertools.count()
+
+    def submit(self, net_image: "NetImage", priority=PRELOAD):
+        """提交一个下载任务。若该 URL 已在队列中或正在下载，则只登记为等待者并提升其优先级。"""
+
+        with self._lock:
+            job = self._jobs.get(net_image.md5)
+            if job is not None:
+                job.add(net_image)
+                self._raise_priority(job, priority)
+                return
+
+            job = _DownloadJob(net_image, priority)
+            self._jobs[job.key] = job
+            self._push(job)
+
+        self._dispatch()
+
+    def prioritize(self, net_image: "NetImage", priority=ON_SCREEN):
+        """若该图片正在排队，则提升其优先级。"""
+
+        with self._lock:
+            job = self._jobs.get(net_image.md5)
+            if job is not None:
+                self._raise_priority(job, priority)
+
+    def cancel(self, net_image: "NetImage"):
+        """取消该图片的等待。若任务尚未开始且不再有等待者，则取消该任务。"""
+
+        with self._lock:
+            job = self._jobs.get(net_image.md5)
+            if job is None:
+                return
+            job.discard(net_image)
+            if not job.started and not job.alive():
+                job.cancelled = True
+                del self._jobs[job.key]
+
+    def _raise_priority(self, job: _DownloadJob, priority):
+        if not job.started and priority > job.priority:
+            job.priority = priority
+            self._push(job)
+
+    def _push(self, job: _DownloadJob):
+        heapq.heappush(self._heap, (-job.priority, next(self._seq), job))
+
+    def _take_job(self):
+        """取出优先级最高且主机连接数未满的任务，没有可执行的任务时返回 None。调用时需持有锁。"""
+
+        job = None
+        deferred = []
+        while self._heap:
+            entry = heapq.heappop(self._heap)
+            candidate = entry[2]
+            # 优先级被提升后，旧的堆条目作废
+            if candidate.started or candidate.cancelled or -entry[0] != candidate.priority:
+                continue
+            if not candidate.alive():
+                candidate.cancelled = True
+                del self._jobs[candidate.key]
+                continue
+            if self._host_active.get(candidate.host, 0) >= self.max_per_host:
+                deferred.append(entry)
+                continue
+            job = candidate
+            break
+
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+
+        return job
+
+    def _dispatch(self):
+        """在下载数未满时，把可执行的任务交给下载后端。"""
+
+        started = []
+        with self._lock:
+            while self._active < self.max_workers:
+                job = self._take_job()
+                if job is None:
+                    break
+                job.started = True
+                self._active += 1
+                self._host_active[job.host] = self._host_active.get(job.host, 0) + 1
+                started.append((job, job.alive()))
+
+        for job, waiters in started:
+            self.backend.start(self, job, waiters)
+
+    def _done(self, job: _DownloadJob, changed: bool):
+        """由下载后端在任务结束后调用。"""
+
+        with self._lock:
+            self._active -= 1
+            self._host_active[job.host] -= 1
+            if not self._host_active[job.host]:
+                del self._host_active[job.host]
+            del self._jobs[job.key]
+            waiters = job.alive()
+
+        try:
+            for net_image in waiters:
+                net_image._finish(changed)
+        finally:
+            self._dispatch()
+
+
+class NetImageThreadBackend:
+    """默认的下载后端。每个正在进行的下载占用一个线程，通过 `NetImage.SESSIONS` 会话池发送请求。"""
+
+    def start(self, scheduler: NetImageScheduler, job: _DownloadJob, waiters: list["NetImage"]):
+        renpy.invoke_in_thread(self._run, scheduler, job, waiters)
+
+    @staticmethod
+    def _run(scheduler: NetImageScheduler, job: _DownloadJob, waiters: list["NetImage"]):
+        changed = False
+        try:
+            if waiters:
+                changed = waiters[0]._download(job.report_progress)
+        finally:
+            scheduler._done(job, changed)
+
+
+class _AsyncResponse:
+    """`NetImageAsyncBackend` 的响应，仅由其内部使用。"""
+
+    def __init__(self, backend: "NetImageAsyncBackend", key, reader, writer, status: int, headers: dict[str, str]):
+        self.backend = backend
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.status = status
+        self.headers = headers
+        self.reusable = headers.get("connection", "").lower() != "close"
+        self.complete = status in (204, 304) or 100 <= status < 200
+
+    async def iter_chunks(self, chunk_size: int):
+        """逐块读取响应体。"""
+
+        import asyncio
+
+        timeout = self.backend.timeout
+        if self.complete:
+            return
+
+        if "chunked" in self.headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await asyncio.wait_for(self.reader.readline(), timeout)
+                size = int(size_line.split(b";")[0].strip(), 16)
+                if not size:
+                    # 跳过 trailer
+                    while await asyncio.wait_for(self.reader.readline(), timeout) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                async for chunk in self._read(size, chunk_size):
+                    yield chunk
+                await asyncio.wait_for(self.reader.readexactly(2), timeout)
+        elif "content-length" in self.headers:
+            async for chunk in self._read(int(self.headers["content-length"]), chunk_size):
+                yield chunk
+        else:
+            # 没有长度信息时，响应体以连接关闭为结束
+            self.reusable = False
+            while chunk := await asyncio.wait_for(self.reader.read(chunk_size), timeout):
+                yield chunk
+
+        self.complete = True
+
+    async def _read(self, remaining: int, chunk_size: int):
+        import asyncio
+
+        while remaining:
+            chunk = await asyncio.wait_for(self.reader.read(min(remaining, chunk_size)), self.backend.timeout)
+            if not chunk:
+                raise ConnectionError("连接在响应体读取完毕前被关闭")
+            remaining -= len(chunk)
+            yield chunk
+
+    def release(self):
+        """归还或关闭连接。只有完整读取了响应体的 keep-alive 连接才会被复用。"""
+
+        if self.complete and self.reusable:
+            self.backend._put_connection(self.key, self.reader, self.writer)
+        else:
+            self.writer.close()
+
+
+class NetImageAsyncBackend:
+    """基于 asyncio 的下载后端。
+
+    所有下载以协程的形式运行在同一个后台事件循环中，文件读写与图片解码交给事件循环专用的小线程池，
+    数百张图片只需事件循环线程和 `max_threads` 个线程即可并发下载。
+    内置一个仅支持 GET 的 HTTP/1.1 客户端，可跟随重定向并复用 keep-alive 连接，
+    并与 `NetImageSessionPool` 一样在连接错误或服务器错误时按指数退避重试。
+    重定向到其他主机时不会转发凭据、条件请求和 Range 请求头。
+
+    内置客户端不支持代理：环境变量或系统设置中为某个 URL 配置了代理时，
+    该 URL 改由 `NetImageThreadBackend` 通过 requests 下载，每个这样的下载占用一个线程。
+    """
+
+    MAX_REDIRECTS = 5
+    # 重定向到其他主机时需要移除的请求头，名称以 "if-" 开头的条件请求头也会被移除
+    CROSS_ORIGIN_STRIPPED_HEADERS = frozenset({"authorization", "proxy-authorization", "cookie", "range"})
+
+    def __init__(
+        self,
+        timeout=30,
+        max_idle_per_host=2,
+        retries=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        max_threads=2,
+    ):
+        """
+        :param timeout: 单次读取的超时秒数
+        :param max_idle_per_host: 每个主机保留的最大空闲连接数
+        :param retries: 最大重试次数
+        :param backoff_factor: 重试退避系数，第 n 次重试前等待 backoff_factor * 2 ** (n - 1) 秒
+        :param status_forcelist: 需要重试的 HTTP 状态码
+        :param max_threads: 用于文件读写和图片解码的线程数
+        """
+
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.status_forcelist = status_forcelist
+        self.max_threads = max_threads
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._proxy_backend = NetImageThreadBackend()
+        # 只在事件循环线程中访问
+        self._idle: dict[tuple, list] = {}
+        self._ssl_context = None
+
+    def start(self, scheduler: NetImageScheduler, job: _DownloadJob, waiters: list["NetImage"]):
+        import asyncio
+
+        if waiters and self._uses_proxy(waiters[0].url):
+            self._proxy_backend.start(scheduler, job, waiters)
+            return
+
+        asyncio.run_coroutine_threadsafe(self._run(scheduler, job, waiters), self._get_loop())
+
+    @staticmethod
+    def _uses_proxy(url: str):
+        """是否为该 URL 配置了代理（与 requests 一样读取环境变量与系统设置）。"""
+
+        from urllib.request import getproxies, proxy_bypass
+
+        parts = urlsplit(url)
+        proxies = getproxies()
+        if parts.scheme not in proxies and "all" not in proxies:
+            return False
+        return not proxy_bypass(parts.netloc)
+
+    def _get_loop(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                # aiofiles 与 `run_in_executor(None, ...)` 都使用事件循环的默认线程池，限制其线程数
+                self._loop.set_default_executor(
+                    ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="NetImage")
+                )
+                renpy.invoke_in_thread(self._loop.run_forever)
+            return self._loop
+
+    async def _run(self, scheduler: NetImageScheduler, job: _DownloadJob, waiters: list["NetImage"]):
+        import asyncio
+
+        changed = False
+        try:
+            if waiters:
+                changed = await self._download(waiters[0], job.report_progress)
+        finally:
+            # 解码图片会阻塞，不在事件循环中进行
+            await asyncio.get_running_loop().run_in_executor(None, scheduler._done, job, changed)
+
+    async def _download(self, net_image: "NetImage", report_progress) -> bool:
+        import aiofiles
+
+        try:
+            headers, meta, offset = net_image._prepare_request()
+
+            logger.debug("下载图片: %s", net_image.url)
+            response = await self._request(net_image.url, headers)
+            try:
+                if response.status == 304:
+                    net_image._not_modified(meta)
+                    return False
+
+                if response.status == 416 and offset:
+                    net_image._discard_part()
+                    return await self._download(net_image, report_progress)
+
+                if response.status >= 400:
+                    raise ConnectionError(f"HTTP {response.status}")
+
+                meta, offset, total, digest = net_image._begin_response(response.status, response.headers, offset)
+                downloaded = offset
+
+                report_progress(downloaded, total)
+                async with aiofiles.open(net_image.part_path, "ab" if offset else "wb") as f:
+                    async for chunk in response.iter_chunks(net_image.CHUNK_SIZE):
+                        await f.write(chunk)
+                        digest.update(chunk)
+                        downloaded += len(chunk)
+                        report_progress(downloaded, total)
+            finally:
+                response.release()
+
+            net_image._commit(meta, downloaded, total, digest)
+            return True
+        except Exception as e:
+            logger.error("下载失败 [%s]: %s", net_image.url, e)
+            return False
+
+    async def _request(self, url: str, headers: dict[str, str]):
+        """发送请求，在连接错误或 `status_forcelist` 中的状态码时按指数退避重试。"""
+
+        import asyncio
+
+        for attempt in range(1, self.retries + 2):
+            try:
+                response = await self._get(url, headers)
+            except (OSError, asyncio.TimeoutError) as e:
+                if attempt > self.retries:
+                    raise
+                delay = self.backoff_factor * 2 ** (attempt - 1)
+                logger.debug("请求失败，%.1f 秒后重试 [%s]: %s", delay, url, e)
+            else:
+                if response.status not in self.status_forcelist or attempt > self.retries:
+                    return response
+                response.release()
+                delay = self.backoff_factor * 2 ** (attempt - 1)
+                retry_after = response.headers.get("retry-after", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                logger.debug("HTTP %d，%.1f 秒后重试: %s", response.status, delay, url)
+
+            await asyncio.sleep(delay)
+
+    async def _get(self, url: str, headers: dict[str, str]):
+        for name, value in headers.items():
+            # 请求头中的换行会在请求中插入额外的行
+            if any(c in f"{name}{value}" for c in "\r\n\0") or ":" in name:
+                raise ValueError(f"无效的请求头: {name!r}")
+
+        key = None
+        for _ in range(self.MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ("http", "https"):
+                raise ValueError(f"不支持的协议: {parts.scheme}")
+
+            origin = key
+            key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+            if origin is not None and key != origin:
+                headers = {
+                    name: value
+                    for name, value in headers.items()
+                    if name.lower() not in self.CROSS_ORIGIN_STRIPPED_HEADERS and not name.lower().startswith("if-")
+                }
+
+            target = parts.path or "/"
+            if parts.query:
+                target += f"?{parts.query}"
+
+            # Host 请求头不能包含 URL 中的用户名与密码
+            host = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname
+            if parts.port:
+                host += f":{parts.port}"
+            if any(c in target for c in " \r\n"):
+                raise ValueError(f"无效的 URL: {url!r}")
+
+            lines = [f"GET {target} HTTP/1.1", f"Host: {host}", "Accept-Encoding: identity"]
+            lines.extend(f"{name}: {value}" for name, value in headers.items())
+            request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+            response = await self._send(key, request)
+            location = response.headers.get("location")
+            if response.status in (301, 302, 303, 307, 308) and location:
+                response.release()
+                url = urljoin(url, location)
+                continue
+            return response
+
+        raise ConnectionError(f"重定向次数超过 {self.MAX_REDIRECTS} 次")
+
+    def _get_ssl_context(self):
+        # 所有 HTTPS 连接共用一个 SSL 上下文，第一次用到时才创建
+        if self._ssl_context is None:
+            import ssl
+            import certifi
+
+            self._ssl_context = ssl.create_default_context(cafile=certifi.where())
+        return self._ssl_context
+
+    async def _send(self, key, request: bytes):
+        import asyncio
+
+        idle = self._idle.get(key, [])
+        while True:
+            reused = bool(idle)
+            if reused:
+                reader, writer = idle.pop()
+            else:
+                ssl_context = self._get_ssl_context() if key[0] == "https" else None
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(key[1], key[2], ssl=ssl_context), self.timeout
+                )
+
+            try:
+                writer.write(request)
+                await writer.drain()
+                status_line = await asyncio.wait_for(reader.readline(), self.timeout)
+            except (ConnectionError, OSError):
+                writer.close()
+                if reused:
+                    continue
+                raise
+
+            # 复用的连接可能已被服务器关闭，此时换一个连接重试
+            if not status_line:
+                writer.close()
+                if reused:
+                    continue
+                raise ConnectionError("服务器关闭了连接")
+
+            try:
+                status = int(status_line.split()[1])
+                response_headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), self.timeout)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    response_headers[name.strip().lower()] = value.strip()
+            except Exception:
+                writer.close()
+                raise
+
+            return _AsyncResponse(self, key, reader, writer, status, response_headers)
+
+    def _put_connection(self, key, reader, writer):
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle_per_host and not writer.is_closing():
+            idle.append((reader, writer))
+        else:
+            writer.close()
+
+
+class NetImageRedrawBatcher:
+    """合并 NetImage 在工作线程中发出的重绘请求。
+
+    请求会被收集起来，在主线程中每帧统一处理一次：重绘所有待重绘的图片，并至多重启一次交互。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: dict[int, "NetImage"] = {}
+        self._restart = False
+        self._scheduled = False
+
+    def request(self, net_image: "NetImage", restart=False):
+        """请求重绘一张图片。
+
+        :param restart: 是否需要重启交互
+        """
+
+        with self._lock:
+            self._pending[id(net_image)] = net_image
+            self._restart = self._restart or restart
+            if self._scheduled:
+                return
+            self._scheduled = True
+
+        renpy.invoke_in_main_thread(self._flush)
+
+    def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            restart, self._restart = self._restart, False
+            self._scheduled = False
+
+        for net_image in pending.values():
+            renpy.redraw(net_image, 0)
+        if restart:
+            renpy.restart_interaction()
+
+
 class NetImage(renpy.Displayable):
 
-    CACHE_DIR = Path(
-        config.gamedir if renpy.windows or renpy.linux
-        else appdirs.user_data_dir(appname=config.name) # type: ignore
-    ) / "net_image_cache"
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    CACHE_DIR = _cache_root() / "net_image_cache"
+    CACHE = NetImageCache(CACHE_DIR)
+    MAX_AGE = 7 * 24 * 60 * 60  # 缓存在该秒数后需要重新验证，为 None 时永不过期
+    CHUNK_SIZE = 64 * 1024
+
+    # id(NetImage) -> NetImage。NetImage 按 URL 判断相等，因此按 id 登记，同一 URL 的每个实例都会被记录
+    ALL_NET_IMAGES: "weakref.WeakValueDictionary[int, NetImage]" = weakref.WeakValueDictionary()
+    SCHEDULER = NetImageScheduler()
+    SESSIONS = NetImageSessionPool(pool_maxsize=SCHEDULER.max_per_host)
+    REDRAW = NetImageRedrawBatcher()
 
-    CACHED_IMAGES = set(p.stem for p in CACHE_DIR.iterdir() if p.is_file())
-    ALL_NET_IMAGES: set["NetImage"] = set()
+    # 存档格式版本，读取旧版本的存档时由 `after_upgrade` 补全属性
+    __version__ = 1
 
-    def __init__(self, url: str, headers=None, cover=None, **properties):
+    def __init__(self, url: str, headers=None, cover=None, on_progress=None, thumbnail=None, cover_function=None, **properties):
         """
         :param url: 图片 URL
         :param headers: 可选请求头
         :param cover: 默认白色封面（当图片未加载或加载失败时显示）
+        :param on_progress: 下载进度回调，在下载线程中以 `(已下载字节数, 总字节数)` 调用，总字节数未知时为 None。不会写入存档
+        :param cover_function: 可选函数，接收下载进度（0~1，未知时为 None）并返回下载期间代替 `cover` 显示的可视组件。不会写入存档
+        :param thumbnail: 可选的最大显示尺寸 `(宽, 高)`，图片解码时会等比缩小到该尺寸内以节省纹理内存
         """
 
         super().__init__(**properties)
@@ -47,54 +915,511 @@ class NetImage(renpy.Displayable):
         self.url = url
         self.headers = headers or {}
         self.fmt = Path(url).suffix.lower()
+        self.cover_function = cover_function
         self.cover = renpy.displayable(cover) if cover else renpy.displayable("#ffffff")
+        self.on_progress = on_progress
+        self.progress = None
         self.md5 = md5(url.encode()).hexdigest()
+        self.thumbnail = tuple(thumbnail) if thumbnail else None
         self.cache_path = self.CACHE_DIR / f"{self.md5}{self.fmt}"
+        self.part_path = self.cache_path.with_name(f"{self.cache_path.name}.part")
+        self.meta_path = self.CACHE.meta_path(self.md5)
         self.image = self._load_cache()
+        self._revalidated = False
 
-        self.ALL_NET_IMAGES.add(self)
+        self.ALL_NET_IMAGES[id(self)] = self
+
+    def load_image(self, priority=NetImageScheduler.PRELOAD):
+        """将图片加入下载队列。
+
+        :param priority: 下载优先级，数值越大越先下载
+        """
+
+        self.SCHEDULER.submit(self, priority)
+
+    def cancel(self):
+        """取消尚未开始的下载。"""
+
+        self.SCHEDULER.cancel(self)
+
+    def refresh(self, priority=NetImageScheduler.REFRESH):
+        """在后台使用条件请求重新验证已缓存的图片，图片有更新时才会重新下载。
+
+        :param priority: 下载优先级，数值越大越先下载
+        """
+
+        self._revalidated = True
+        self.load_image(priority)
+
+    def is_stale(self):
+        """已缓存的图片是否超过 `MAX_AGE` 需要重新验证。"""
+
+        if self.MAX_AGE is None or self.md5 not in self.CACHE:
+            return False
+        return time.time() - self._read_meta().get("fetched_at", 0) > self.MAX_AGE
+
+    def _read_meta(self):
+        try:
+            return json.loads(self.meta_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta):
+        try:
+            self.meta_path.write_text(json.dumps(meta), encoding="utf-8")
+        except OSError as e:
+            logger.warning("无法写入缓存元数据 [%s]: %s", self.meta_path.name, e)
+
+    def _prepare_request(self):
+        """返回下载所需的请求头、缓存元数据和断点续传的起始位置。"""
+
+        headers = dict(self.headers)
+        meta = {}
+        offset = 0
+        if self.md5 in self.CACHE and not self.cache_path.exists():
+            # 索引中有记录但文件已不存在，不能再发送校验值，否则 304 响应会使图片永远无法重新下载
+            logger.warning("缓存文件丢失，重新下载: %s", self.cache_path.name)
+            self.CACHE.remove(self.md5)
+
+        if self.md5 in self.CACHE:
+            meta = self._read_meta()
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+        elif self.part_path.exists():
+            # 断点续传，仅在服务器给出的校验值不变时才接着已下载的部分继续
+            meta = self._read_meta()
+            validator = meta.get("etag") or meta.get("last_modified")
+            if validator:
+                offset = self.part_path.stat().st_size
+                headers["Range"] = f"bytes={offset}-"
+                headers["If-Range"] = validator
+
+        return headers, meta, offset
+
+    def _not_modified(self, meta):
+        meta["fetched_at"] = time.time()
+        self._write_meta(meta)
+        self.CACHE.touch(self.md5)
+        logger.debug("图片未变化: %s", self.url)
+
+    def _begin_response(self, status: int, headers, offset: int):
+        """处理响应头，返回新的缓存元数据、实际的续传位置、总字节数和文件内容的 sha256 对象。"""
+
+        meta = {
+            "url": self.url,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        }
+        # 记录校验值以便断点续传；重新验证已缓存的图片时，新的校验值要等下载完成后再写入
+        if self.md5 not in self.CACHE:
+            self._write_meta(meta)
+
+        if status != 206:
+            offset = 0
+        length = headers.get("content-length")
+        # 压缩传输时 Content-Length 是压缩后的大小，与写入的字节数不可比
+        if headers.get("content-encoding", "identity").lower() != "identity":
+            length = None
+        total = offset + int(length) if length else None
+
+        # 边下载边计算 sha256，续传时先计入已下载的部分
+        digest = sha256()
+        if offset:
+            with open(self.part_path, "rb") as f:
+                while chunk := f.read(self.CHUNK_SIZE):
+                    digest.update(chunk)
+        return meta, offset, total, digest
+
+    def _discard_part(self):
+        """服务器以 416 拒绝续传时（未完成的文件已经完整或已失效），删除未完成的文件。"""
+
+        logger.warning("无法续传，重新下载: %s", self.url)
+        self.part_path.unlink(missing_ok=True)
+
+    def _check_download(self, downloaded: int, total, digest):
+        """在下载的文件移入缓存前检查，不通过时抛出异常。"""
+
+        if total is not None and downloaded != total:
+            # 保留未完成的文件，下次下载时续传
+            raise ConnectionError(f"响应体不完整: {downloaded}/{total} 字节")
+
+    def _commit(self, meta, downloaded: int, total, digest):
+        self._check_download(downloaded, total, digest)
+
+        self.part_path.replace(self.cache_path)
+        meta["sha256"] = digest.hexdigest()
+        meta["fetched_at"] = time.time()
+        self._write_meta(meta)
+        self.CACHE.add(self.md5, self.cache_path.name, downloaded)
+        logger.info("图片已缓存: %s", self.cache_path.name)
+
+    def _download(self, report_progress) -> bool:
+        """下载图片到缓存，由 `NetImageThreadBackend` 在下载线程中调用。
+
+        :param report_progress: 下载进度回调，以 `(已下载字节数, 总字节数)` 调用
+        :return: 缓存文件是否被更新
+        """
+
+        try:
+            headers, meta, offset = self._prepare_request()
+
+            logger.debug("下载图片: %s", self.url)
+            with self.SESSIONS.session() as session, \
+                    session.get(self.url, headers=headers, timeout=30, stream=True) as response:
+
+                if response.status_code == 304:
+                    self._not_modified(meta)
+                    return False
+
+                if response.status_code == 416 and offset:
+                    self._discard_part()
+                    return self._download(report_progress)
 
-    def load_image(self):
-        def _task():
-            try:
-                logger.debug("下载图片: %s", self.url)
-                response = requests.get(self.url, headers=self.headers, timeout=30)
                 response.raise_for_status()
-                self.cache_path.write_bytes(response.content)
-                self.CACHED_IMAGES.add(self.md5)
-                logger.info("图片已缓存: %s", self.cache_path.name)
-                self.image = renpy.displayable((Data(response.content, self.fmt)))
-            except Exception as e:
-                logger.error("下载失败 [%s]: %s", self.url, e)
-            finally:
-                renpy.redraw(self, 0)
-                renpy.restart_interaction()
+                meta, offset, total, digest = self._begin_response(response.status_code, response.headers, offset)
+                downloaded = offset
 
-        renpy.invoke_in_thread(_task)
+                report_progress(downloaded, total)
+                with open(self.part_path, "ab" if offset else "wb") as f:
+                    for chunk in response.iter_content(self.CHUNK_SIZE):
+                        f.write(chunk)
+                        digest.update(chunk)
+                        downloaded += len(chunk)
+                        report_progress(downloaded, total)
+
+            self._commit(meta, downloaded, total, digest)
+            return True
+        except Exception as e:
+            logger.error("下载失败 [%s]: %s", self.url, e)
+            return False
+
+    def _finish(self, changed: bool):
+        """下载结束后由调度器调用，每个等待该 URL 的 NetImage 都会被调用一次。
+
+        :param changed: 缓存文件是否被更新
+        """
+
+        try:
+            if changed:
+                image = self._image_file()
+                self._predecode(image)
+                self.image = image
+        except Exception as e:
+            logger.error("加载图片失败 [%s]: %s", self.url, e)
+        finally:
+            self.progress = None
+            self.REDRAW.request(self, restart=True)
+
+    def _set_progress(self, downloaded, total):
+        if self.on_progress is not None:
+            self.on_progress(downloaded, total)
+
+        progress = downloaded / total if total else None
+        # 进度每变化 1% 才重绘一次封面
+        if progress is None or self.progress is None:
+            if progress is self.progress:
+                return
+        elif progress - self.progress < 0.01:
+            return
+
+        self.progress = progress
+        if self.cover_function is not None:
+            self.REDRAW.request(self)
+
+    @classmethod
+    def _cache_file_lost(cls, key: str):
+        """缓存文件丢失或无法读取时，删除其索引记录，并让使用该图片的 NetImage 显示封面并重新下载。"""
+
+        if key not in cls.CACHE:
+            return
+        cls.CACHE.remove(key)
+
+        for net_image in list(cls.ALL_NET_IMAGES.values()):
+            if net_image.md5 == key:
+                net_image.image = net_image.cover
+                net_image.load_image(NetImageScheduler.ON_SCREEN)
+                cls.REDRAW.request(net_image, restart=True)
+
+    @classmethod
+    def use_async_backend(cls, max_workers=32, max_per_host=8, **kwargs):
+        """切换为 asyncio 下载后端，以少量线程并发下载大量图片。
+
+        :param max_workers: 最大同时下载数
+        :param max_per_host: 每个主机的最大并发连接数
+        :param kwargs: 传递给 `NetImageAsyncBackend` 的参数
+        """
+
+        kwargs.setdefault("max_idle_per_host", max_per_host)
+        kwargs.setdefault("retries", cls.SESSIONS.retries)
+        kwargs.setdefault("backoff_factor", cls.SESSIONS.backoff_factor)
+        kwargs.setdefault("status_forcelist", cls.SESSIONS.status_forcelist)
+        cls.SCHEDULER.backend = NetImageAsyncBackend(**kwargs)
+        cls.SCHEDULER.max_workers = max_workers
+        cls.SCHEDULER.max_per_host = max_per_host
+
+    @classmethod
+    def prefetch(cls, manifest, headers=None, rate=None, on_progress=None):
+        """在后台把清单中的图片预取到缓存中，无需创建对应的 NetImage。
+
+        :param manifest: URL 列表，或 Ren'Py 路径下的 JSON 清单文件。
+            列表项可以是 URL 字符串，也可以是 `{"url": ..., "sha256": ...}`，提供 sha256 时会校验下载的文件。
+            JSON 清单的内容为同样格式的列表，或 `{"images": [...]}`
+        :param headers: 可选请求头
+        :param rate: 每秒最多发起的下载数，为 None 时不限制
+        :param on_progress: 进度回调，以 `(已完成数, 总数)` 调用
+        :return: 一个 `NetImagePrefetch` 对象
+        """
+
+        if isinstance(manifest, str):
+            with renpy.open_file(manifest) as f:
+                manifest = json.load(f)
+        if isinstance(manifest, dict):
+            manifest = manifest.get("images", [])
+
+        entries = []
+        for entry in manifest:
+            if isinstance(entry, str):
+                entries.append((entry, None))
+            else:
+                entries.append((entry["url"], entry.get("sha256")))
+
+        prefetch = NetImagePrefetch(entries, headers, rate, on_progress)
+        prefetch.start()
+        return prefetch
 
     @classmethod
     def preload_all(cls):
-        for net_image in cls.ALL_NET_IMAGES:
-            if net_image.md5 not in cls.CACHED_IMAGES:
+        """下载所有未缓存的图片，并在后台重新验证已过期的缓存。"""
+
+        # 同一 URL 的多个实例由调度器合并为一次下载
+        for net_image in list(cls.ALL_NET_IMAGES.values()):
+            if net_image.md5 not in cls.CACHE:
                 net_image.load_image()
+            elif net_image.is_stale():
+                net_image.refresh()
 
     def render(self, width, height, st, at):
+        if self.image is self.cover:
+            self.SCHEDULER.prioritize(self)
+        elif not self._revalidated:
+            self._revalidated = True
+            if self.is_stale():
+                self.refresh()
+
+        image = self.image
+        if image is self.cover and self.cover_function is not None:
+            image = renpy.displayable(self.cover_function(self.progress))
+
         render = renpy.Render(width, height)
-        render.blit(renpy.render(self.image, width, height, st, at), (0, 0))
+        render.blit(renpy.render(image, width, height, st, at), (0, 0))
         return render
 
-    def _get_image(self):
-        if renpy.windows or renpy.linux:
-            return self.cache_path.relative_to(config.gamedir).as_posix()
-        return Data(self.cache_path.read_bytes(), self.cache_path.name)
+    def visit(self):
+        # 让 Ren'Py 的预测线程提前解码已缓存的图片
+        return [self.image]
+
+    def _image_file(self):
+        """返回缓存文件对应的图片。解码后的图片由 Ren'Py 的图片缓存按其标识共享与淘汰，其大小按实际占用的内存计算。"""
+
+        return NetImageFile(str(self.cache_path), self.thumbnail, self.CACHE.version(self.md5), key=self.md5)
+
+    def _predecode(self, image):
+        """在下载线程中预先解码图片，避免首次显示时在主线程中解码造成卡顿。"""
+
+        try:
+            im.cache.get(image, predict=True)
+        except Exception as e:
+            logger.warning("预解码失败 [%s]: %s", self.url, e)
 
     def _load_cache(self):
-        if not self.cache_path.exists():
+        if self.md5 not in self.CACHE:
             return self.cover
-        return renpy.displayable(self._get_image())
+        self.CACHE.touch(self.md5)
+        return self._image_file()
 
     def __eq__(self, other):
         return isinstance(other, NetImage) and self.url == other.url
 
     def __hash__(self):
-        return hash(self.url)
\ No newline at end of file
+        return hash(self.url)
+
+    def after_upgrade(self, version):
+        if version < 1:
+            # 旧版本存档中的 NetImage 只有 url、headers、fmt、cover、md5、cache_path 与 image
+            self.cover_function = None
+            self.on_progress = None
+            self.progress = None
+            self.thumbnail = None
+            self.cache_path = self.CACHE_DIR / f"{self.md5}{self.fmt}"
+            self.part_path = self.cache_path.with_name(f"{self.cache_path.name}.part")
+            self.meta_path = self.CACHE.meta_path(self.md5)
+            self.image = self._load_cache()
+            self._revalidated = False
+
+    def after_setstate(self):
+        # 读档得到的 NetImage 也登记到 `ALL_NET_IMAGES` 中
+        self.ALL_NET_IMAGES[id(self)] = self
+
+    def __getstate__(self):
+        # 显示过的可视组件会随存档一起保存，回调函数（如 lambda）往往无法序列化
+        state = dict(super().__getstate__())
+        state["cover_function"] = None
+        state["on_progress"] = None
+        return state
+
+
+class _PrefetchImage(NetImage):
+    """仅用于 `NetImagePrefetch` 的 NetImage，下载完成后只校验文件，不解码图片。
+
+    由它下载的文件在移入缓存前校验 sha256，不匹配的文件不会进入缓存；
+    已缓存的文件按缓存元数据中记录的 sha256 校验。
+    """
+
+    def __init__(self, prefetch: "NetImagePrefetch", url: str, headers=None, sha256=None):
+        self.prefetch = prefetch
+        self.sha256 = sha256.lower() if sha256 else None
+        super().__init__(url, headers)
+        # 预取的图片不显示，不参与 `preload_all` 与缓存丢失时的重新加载
+        self.ALL_NET_IMAGES.pop(id(self), None)
+
+    def _check_download(self, downloaded: int, total, digest):
+        super()._check_download(downloaded, total, digest)
+
+        if self.sha256 and digest.hexdigest() != self.sha256:
+            self.part_path.unlink(missing_ok=True)
+            raise ValueError("sha256 不匹配")
+
+    def _finish(self, changed: bool):
+        # 同一 URL 的下载可能由其他 NetImage 完成，因此下载后仍按元数据再校验一次
+        self.prefetch._complete(self, self.md5 in self.CACHE and self.verify())
+
+    def verify(self):
+        """按缓存元数据中记录的 sha256 校验已缓存的文件，不匹配时将其移出缓存。"""
+
+        if not self.sha256:
+            return True
+
+        meta = self._read_meta()
+        if not meta.get("sha256"):
+            # 旧版本缓存的文件没有记录 sha256，计算一次并写入元数据
+            digest = sha256()
+            try:
+                with open(self.cache_path, "rb") as f:
+                    while chunk := f.read(self.CHUNK_SIZE):
+                        digest.update(chunk)
+            except OSError:
+                self.CACHE.remove(self.md5)
+                return False
+            meta["sha256"] = digest.hexdigest()
+            self._write_meta(meta)
+
+        if meta["sha256"] == self.sha256:
+            return True
+
+        logger.error("校验失败 [%s]: sha256 不匹配", self.url)
+        self.CACHE.remove(self.md5)
+        return False
+
+
+class NetImagePrefetch:
+    """清单预取任务，由 `NetImage.prefetch` 创建。"""
+
+    def __init__(self, entries: list[tuple[str, str | None]], headers=None, rate=None, on_progress=None):
+        """
+        :param entries: `(URL, sha256)` 列表，sha256 可以为 None
+        :param headers: 可选请求头
+        :param rate: 每秒最多发起的下载数，为 None 时不限制
+        :param on_progress: 进度回调，以 `(已完成数, 总数)` 调用
+        """
+
+        self.entries = entries
+        self.headers = headers
+        self.rate = rate
+        self.on_progress = on_progress
+
+        self.total = len(entries)
+        self.done = 0
+        self.failed: list[str] = []
+        self.cancelled = False
+
+        self._lock = threading.Lock()
+        self._pending: dict[int, _PrefetchImage] = {}
+        self._finished = threading.Event()
+
+    @property
+    def progress(self):
+        """预取进度，0~1。"""
+
+        return self.done / self.total if self.total else 1.0
+
+    @property
+    def finished(self):
+        """预取是否已结束（全部完成或被取消）。"""
+
+        return self._finished.is_set()
+
+    def start(self):
+        """开始预取。"""
+
+        if not self.entries:
+            self._finished.set()
+            return
+        renpy.invoke_in_thread(self._run)
+
+    def wait(self, timeout=None):
+        """阻塞等待预取结束，返回是否已结束。"""
+
+        return self._finished.wait(timeout)
+
+    def cancel(self):
+        """取消尚未开始的下载。"""
+
+        self.cancelled = True
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for image in pending:
+            image.cancel()
+        self._finished.set()
+
+    def _run(self):
+        interval = 1 / self.rate if self.rate else 0
+
+        for url, digest in self.entries:
+            if self.cancelled:
+                return
+
+            image = _PrefetchImage(self, url, self.headers, digest)
+            if image.md5 in image.CACHE and not image.is_stale() and image.verify():
+                self._complete(image, True)
+                continue
+
+            with self._lock:
+                self._pending[id(image)] = image
+            if image.md5 in image.CACHE:
+                image.refresh(NetImageScheduler.PREFETCH)
+            else:
+                image.load_image(NetImageScheduler.PREFETCH)
+
+            if interval:
+                time.sleep(interval)
+
+    def _complete(self, image: _PrefetchImage, ok: bool):
+        with self._lock:
+            self._pending.pop(id(image), None)
+            self.done += 1
+            if not ok:
+                self.failed.append(image.url)
+            done = self.done
+
+        if self.on_progress is not None:
+            self.on_progress(done, self.total)
+
+        if done >= self.total:
+            logger.info("预取完成: %d 张图片，%d 张失败", self.total, len(self.failed))
+            self._finished.set()
+
+
+config.quit_callbacks.append(NetImage.CACHE.save)
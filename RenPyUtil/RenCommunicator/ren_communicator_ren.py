@@ -9,11 +9,14 @@ init -1 python:
 """
 
 
+import hashlib
 import logging
 import os 
 import pickle
 import socket
-import time
+import threading
+import weakref
+from collections import OrderedDict
 from typing import Optional
 
 
@@ -52,6 +55,137 @@ def set_logger(logger_name: str, log_path: str):
     return logger
 
 
+class MovieCache(object):
+    """影片缓存类，以影片内容的哈希值命名缓存文件，超出容量时淘汰最久未使用且不再被 `Movie` 使用的影片"""
+
+    logger = set_logger("MovieCache", "RenCommunicator.log")
+
+    MAX_SIZE = 1073741824 # 每个缓存目录的最大大小，默认为1G
+    _caches: dict[str, "MovieCache"] = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, cache_path: str = "movie_cache", max_size: int = None):
+        """初始化方法。一般不显式调用，而是使用 `get` 类方法获取缓存对象。
+
+        Keyword Arguments:
+            cache_path -- 缓存目录，相对于游戏目录 (default: {"movie_cache"})
+            max_size -- 缓存目录的最大大小。默认为 `MovieCache.MAX_SIZE` (default: {None})
+        """
+
+        self.cache_dir = os.path.join(config.gamedir, cache_path)
+        self.max_size = max_size or MovieCache.MAX_SIZE
+        self.lock = threading.RLock()
+        self.users: dict[str, weakref.WeakSet] = {} # 缓存文件名 -> 正在使用该文件的 `Movie`
+
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        # 按最近使用时间排序，最久未使用的影片位于最前
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # 上次写入中断时遗留的临时文件
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    MovieCache.logger.warning(f"无法删除临时文件 {name}：{e}")
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name, stat.st_size))
+        entries.sort()
+
+        self.files: OrderedDict[str, int] = OrderedDict((name, size) for _, name, size in entries)
+        self.size = sum(self.files.values())
+
+    @classmethod
+    def get(cls, cache_path: str = "movie_cache"):
+        """调用该类方法，获取指定缓存目录对应的缓存对象。同一目录只会创建一个缓存对象。"""
+
+        with cls._caches_lock:
+            if cache_path not in cls._caches:
+                cls._caches[cache_path] = cls(cache_path)
+            return cls._caches[cache_path]
+
+    def store(self, data: bytes, fmt: str):
+        """调用该方法，缓存影片数据。若相同内容的影片已被缓存，则直接返回其路径而不再写入。
+
+        Arguments:
+            data -- 影片数据
+            fmt -- 影片格式，如 `.webm`
+
+        Returns:
+            缓存文件的绝对路径
+        """
+
+        cache_name = f"{hashlib.sha256(data).hexdigest()}{fmt}"
+        cache_path = os.path.join(self.cache_dir, cache_name)
+
+        with self.lock:
+            if cache_name in self.files and os.path.exists(cache_path):
+                self.files.move_to_end(cache_name)
+                os.utime(cache_path)
+                MovieCache.logger.debug(f"命中影片缓存：{cache_path}")
+                return cache_path
+
+            tmp_path = f"{cache_path}.tmp"
+            with open(tmp_path, "wb") as cache:
+                cache.write(data)
+            os.replace(tmp_path, cache_path)
+
+            self.size += len(data) - self.files.pop(cache_name, 0)
+            self.files[cache_name] = len(data)
+            MovieCache.logger.debug(f"成功将影片缓存到 {cache_path}")
+
+            self._evict()
+
+        return cache_path
+
+    def movie(self, data: bytes, fmt: str, **kwargs):
+        """调用该方法，缓存影片数据并返回播放该缓存文件的 `Movie` 可视组件。在该组件被回收前，缓存文件不会被淘汰。
+
+        Arguments:
+            data -- 影片数据
+            fmt -- 影片格式，如 `.webm`
+
+        其他关键字参数将传递给 `Movie` 类
+        """
+
+        with self.lock:
+            cache_path = self.store(data, fmt)
+            movie = Movie(play=cache_path, **kwargs)
+            self.users.setdefault(os.path.basename(cache_path), weakref.WeakSet()).add(movie)
+
+        return movie
+
+    def _in_use(self, cache_name: str):
+        users = self.users.get(cache_name)
+        if users is None:
+            return False
+        if not users:
+            del self.users[cache_name]
+            return False
+        return True
+
+    def _evict(self):
+        """该方法用于淘汰最久未使用且不再被使用的影片，直到缓存大小不超过上限，用于类内部使用，不应被调用"""
+
+        # 始终保留最近写入的影片
+        for cache_name in list(self.files)[:-1]:
+            if self.size <= self.max_size:
+                break
+            if self._in_use(cache_name):
+                continue
+
+            size = self.files.pop(cache_name)
+            try:
+                os.remove(os.path.join(self.cache_dir, cache_name))
+            except OSError as e:
+                MovieCache.logger.warning(f"无法删除影片缓存 {cache_name}：{e}")
+            self.size -= size
+            MovieCache.logger.debug(f"已淘汰影片缓存：{cache_name}")
+
+
 class Message(object):
     """消息类，用于创建通信中收发的消息对象"""
 
@@ -257,10 +391,12 @@ class Message(object):
         return self._audio
         
     def get_movie(self, cache_path: str = "movie_cache", **kwargs):
-        """_summary_
+        """若消息类型为影片，则将影片缓存后返回该影片的可视组件。否则返回 None
+
+        影片以内容哈希命名缓存，重复接收的影片将直接使用已有的缓存。缓存大小上限见 `MovieCache.MAX_SIZE`
 
         Keyword Arguments:
-            cache_path -- 视频缓存目录 (default: {None})
+            cache_path -- 视频缓存目录 (default: {"movie_cache"})
 
         Returns:
             一个 `Movie` 可视组件
@@ -272,17 +408,7 @@ class Message(object):
             return
         
         if not self._movie:
-            cache_name = f"{int(time.time())}{self.fmt.decode()}"
-            cache_dir = Message.parse_path(cache_path)
-            cache_path = Message.parse_path(cache_path, cache_name)
-            if not os.path.exists(cache_dir):
-                os.makedirs(cache_dir)
-
-            with open(cache_path, "wb") as cache:
-                cache.write(self.data)
-            Message.logger.debug(f"成功将影片缓存到 {cache_path}")
-
-            self._movie = Movie(play=cache_path, **kwargs)
+            self._movie = MovieCache.get(cache_path).movie(self.data, self.fmt.decode(), **kwargs)
             Message.logger.debug(f"成功将影片解析为可视组件：{self._movie}")
 
         return self._movie
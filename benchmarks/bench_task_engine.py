@@ -0,0 +1,188 @@
+# 描述  ren_advanced_character 任务引擎的基准测试
+# 作者  ZYKsslm
+# 仓库  https://github.com/ZYKsslm/RenPyUtil
+# 声明  该源码使用 MIT 协议开源，但若使用需要在程序中标明作者信息
+
+"""ren_advanced_character 任务引擎的基准测试。
+
+无需 Ren'Py 环境：脚本会在 `sys.modules` 中放入一个最小的 `renpy` 替身，然后创建 N 个角色，
+每个角色绑定 M 个任务、每个任务 K 个条件，模拟语句执行（修改属性并调用 `config.python_callbacks`），
+报告每条语句的耗时与内存占用。
+
+需要 Python 3.12 及以上版本（ren_advanced_character 使用了 `typing.override`）。
+
+用法：
+    python benchmarks/bench_task_engine.py -n 200 -m 10 -k 3
+    python benchmarks/bench_task_engine.py --group > bench_output.txt
+"""
+
+
+import sys
+import time
+import types
+import pickle
+import random
+import argparse
+import tracemalloc
+
+from pathlib import Path
+from statistics import mean, median
+
+
+def install_renpy_stub():
+    """在 `sys.modules` 中放入任务引擎用到的最小 `renpy` 替身。"""
+
+    renpy = types.ModuleType("renpy")
+    exports = types.ModuleType("renpy.exports")
+    config = types.ModuleType("renpy.config")
+    character = types.ModuleType("renpy.character")
+    revertable = types.ModuleType("renpy.revertable")
+    store = types.ModuleType("renpy.store")
+
+    exports.version_tuple = types.SimpleNamespace(major=8, minor=4, patch=0, commit=0)
+    exports.random = random.Random(0)
+    exports.character = character
+    exports.get_at_list = lambda image_tag, layer=None: None
+    exports.show = lambda *args, **kwargs: None
+
+    config.python_callbacks = []
+
+    class ADVCharacter(object):
+        def __init__(self, name=None, kind=None, **properties):
+            self.name = name
+            self.image_tag = properties.pop("image", None)
+            self.display_args = {}
+            self.properties = properties
+
+    character.ADVCharacter = ADVCharacter
+    character.NotSet = object()
+
+    # 替身中没有回滚日志，修改时不做任何记录
+    class RevertableObject(object):
+        pass
+
+    revertable.RevertableObject = RevertableObject
+    revertable.mutator = lambda method: method
+
+    store.emphasize = lambda t, l: (t, l)
+
+    for name, module in (("exports", exports), ("config", config), ("character", character), ("revertable", revertable), ("store", store)):
+        setattr(renpy, name, module)
+        sys.modules[f"renpy.{name}"] = module
+    sys.modules["renpy"] = renpy
+
+    return config
+
+
+# 任务触发次数。任务函数需要能被序列化，因此定义在模块级
+fired = [0]
+
+
+def on_fire():
+    fired[0] += 1
+
+
+def build(args, rng: random.Random):
+    """创建角色与任务，返回 (角色列表, 属性名列表, 角色组或 None)。"""
+
+    from ren_advanced_character import AdvancedCharacter, CharacterGroup, CharacterTask
+
+    attrs = [f"attr_{i}" for i in range(args.attrs)]
+
+    def make_task():
+        task = CharacterTask(single_use=False, priority=rng.randrange(10))
+        for _ in range(args.conditions):
+            # 属性值取 0~99，阈值较高，使多个条件同时满足的情况较少
+            task.add_condition(f"{{{rng.choice(attrs)}}} > {rng.randrange(50, 100)}")
+        task.add_func(on_fire)
+        return task
+
+    schema = {attr: int for attr in attrs} if args.schema else None
+    characters = []
+    for i in range(args.characters):
+        character = AdvancedCharacter(f"c{i}", schema=schema, rollback=args.rollback)
+        character.set(**{attr: rng.randrange(100) for attr in attrs})
+        characters.append(character)
+
+    group = None
+    if args.group:
+        group = CharacterGroup(*characters)
+        for _ in range(args.tasks):
+            group.add_task(make_task())
+    else:
+        for character in characters:
+            for _ in range(args.tasks):
+                character.add_task(make_task())
+
+    return characters, attrs, group
+
+
+def run_statements(config, characters, attrs, count, writes, rng: random.Random) -> list[int]:
+    """模拟 `count` 条语句，每条语句修改 `writes` 个属性，返回每条语句的耗时（纳秒）。"""
+
+    timings = []
+    for _ in range(count):
+        targets = [(rng.choice(characters), rng.choice(attrs), rng.randrange(100)) for _ in range(writes)]
+
+        start = time.perf_counter_ns()
+        for character, attr, value in targets:
+            setattr(character, attr, value)
+        for callback in config.python_callbacks:
+            callback()
+        timings.append(time.perf_counter_ns() - start)
+
+    return timings
+
+
+def report(title, timings: list[int]):
+    timings = sorted(timings)
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{title}：平均 {mean(timings) / 1000:9.2f} us  中位数 {median(timings) / 1000:9.2f} us  p95 {p95 / 1000:9.2f} us  最大 {timings[-1] / 1000:9.2f} us")
+
+
+def main():
+    if sys.version_info < (3, 12):
+        sys.exit(f"需要 Python 3.12 及以上版本（ren_advanced_character 使用了 typing.override），当前为 {sys.version.split()[0]}")
+
+    parser = argparse.ArgumentParser(description="ren_advanced_character 任务引擎基准测试（需要 Python 3.12+）")
+    parser.add_argument("-n", "--characters", type=int, default=100, help="角色数量")
+    parser.add_argument("-m", "--tasks", type=int, default=10, help="每个角色（或角色组）绑定的任务数")
+    parser.add_argument("-k", "--conditions", type=int, default=2, help="每个任务的条件数")
+    parser.add_argument("-a", "--attrs", type=int, default=8, help="每个角色的自定义属性数")
+    parser.add_argument("-w", "--writes", type=int, default=3, help="每条语句修改的属性数")
+    parser.add_argument("-s", "--statements", type=int, default=2000, help="模拟的语句数")
+    parser.add_argument("--group", action="store_true", help="把任务绑定到包含所有角色的角色组上")
+    parser.add_argument("--schema", action="store_true", help="使用声明的属性结构存储自定义属性")
+    parser.add_argument("--rollback", action="store_true", help="使用参与回滚的属性记录（替身中不记录回滚日志）")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "python-packages"))
+    config = install_renpy_stub()
+    rng = random.Random(args.seed)
+
+    print(f"角色 {args.characters}，任务 {args.tasks}{'（角色组）' if args.group else '/角色'}，条件 {args.conditions}/任务，"
+          f"属性 {args.attrs}，每条语句写入 {args.writes} 次，共 {args.statements} 条语句")
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    characters, attrs, group = build(args, rng)
+    build_time = time.perf_counter() - start
+    build_memory, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"创建耗时 {build_time * 1000:.1f} ms，内存 {build_memory / 1024:.1f} KiB（峰值 {build_peak / 1024:.1f} KiB）")
+
+    # 第一条语句会检查所有新绑定的任务，不计入统计
+    run_statements(config, characters, attrs, 1, 0, rng)
+
+    report("空语句", run_statements(config, characters, attrs, args.statements, 0, rng))
+    report("修改属性的语句", run_statements(config, characters, attrs, args.statements, args.writes, rng))
+    print(f"任务触发 {fired[0]} 次")
+
+    saved = pickle.dumps((characters, group), pickle.HIGHEST_PROTOCOL)
+    print(f"存档大小 {len(saved) / 1024:.1f} KiB（每个角色 {len(saved) / len(characters):.0f} B）")
+
+
+if __name__ == "__main__":
+    main()
@@ -19,9 +19,11 @@ __version__ = "0.2.0"
 __all__ = [
     "AdvancedCharacter",
     "CharacterGroup",
+    "CharacterSet",
     "SpeakingGroup",
     "CharacterError",
     "CharacterTask",
+    "TaskQueue",
 ]
 
 
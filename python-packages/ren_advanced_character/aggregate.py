@@ -0,0 +1,101 @@
+# 描述  角色组属性统计类
+# 作者  ZYKsslm
+# 仓库  https://github.com/ZYKsslm/RenPyUtil
+# 声明  该源码使用 MIT 协议开源，但若使用需要在程序中标明作者信息
+
+
+from typing import Callable, Iterable
+
+from .record import MISSING
+
+
+class AttrAggregate:
+    """角色组中某个自定义属性的统计值（总和、最小值、最大值、平均值与数量）。
+
+    统计值在第一次读取时计算，之后随成员属性的修改增量更新；
+    无法增量更新时（如最小值被调大）只把对应的统计值标记为过期，下次读取时再重新计算。
+    浮点数的总和在多次增量更新后可能有微小的舍入误差。
+    """
+
+    __slots__ = ("_values", "_count", "_sum", "_min", "_max")
+
+    def __init__(self, values: Callable[[], Iterable]):
+        """
+        Args:
+            values: 返回所有拥有该属性的成员的属性值的函数
+        """
+
+        self._values = values
+        self._count = None
+        self._sum = None
+        self._min = None
+        self._max = None
+
+    def reset(self):
+        """把所有统计值标记为过期，下次读取时重新计算。"""
+
+        self._count = self._sum = self._min = self._max = None
+
+    @property
+    def count(self) -> int:
+        """拥有该属性的成员数量。"""
+
+        if self._count is None:
+            self._count = sum(1 for _ in self._values())
+        return self._count
+
+    @property
+    def sum(self):
+        if self._sum is None:
+            self._sum = sum(self._values())
+        return self._sum
+
+    @property
+    def min(self):
+        """最小值，没有成员拥有该属性时为 None。"""
+
+        if self._min is None:
+            self._min = min(self._values(), default=None)
+        return self._min
+
+    @property
+    def max(self):
+        """最大值，没有成员拥有该属性时为 None。"""
+
+        if self._max is None:
+            self._max = max(self._values(), default=None)
+        return self._max
+
+    @property
+    def mean(self):
+        """平均值，没有成员拥有该属性时为 None。"""
+
+        return self.sum / self.count if self.count else None
+
+    def update(self, old, new):
+        """成员的属性值由 `old` 变为 `new` 时更新统计值。`old` 为 `MISSING` 表示该成员之前没有该属性。"""
+
+        try:
+            if old is MISSING:
+                if self._count is not None:
+                    self._count += 1
+                if self._sum is not None:
+                    self._sum += new
+            elif self._sum is not None:
+                self._sum += new - old
+
+            if self._min is not None:
+                if new <= self._min:
+                    self._min = new
+                elif old is not MISSING and old == self._min:
+                    self._min = None
+
+            if self._max is not None:
+                if new >= self._max:
+                    self._max = new
+                elif old is not MISSING and old == self._max:
+                    self._max = None
+
+        except TypeError:
+            # 属性值不是数字，全部标记为过期，读取时再报错
+            self.reset()
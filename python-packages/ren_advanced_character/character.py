@@ -6,33 +6,153 @@
 
 import random
 
-from typing import override
+from typing import Callable, Iterable, override
 from functools import partial
 
 from .task import CharacterTask
+from .record import MISSING, RollbackRecord, record_class
+from .aggregate import AttrAggregate
+from .scheduler import TaskOwner, scheduler
 from .exception import ChrErrorType, CharacterError
 
 import renpy.exports as renpy # type: ignore
-import renpy.config as config  # type: ignore
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from renpy.character import ADVCharacter # type: ignore
 
 
-class AdvancedCharacter(ADVCharacter):
+class AdvancedCharacter(TaskOwner, ADVCharacter):
     """该类继承自ADVCharacter类，在原有的基础上增添了一些新的属性和方法。"""
 
-    def __init__(self, name=None, kind=None, **properties):
+    # 在实例的 `user_attrs` 创建之前，`__setattr__` 使用该默认值
+    user_attrs = frozenset()
+
+    def __init__(self, name=None, kind=None, schema: dict[str, type] | None = None, rollback=False, **properties):
         """初始化方法。若实例属性需要被存档保存，则定义对象时请使用`default`语句或Python语句。
 
-        参数与 `Character` 函数一致。
+        除 `schema` 外，参数与 `Character` 函数一致。
+
+        Args:
+            schema: 可选的属性结构（属性名 -> 类型或类型元组）。声明后，自定义属性存放在一个紧凑的记录中，赋值时检查类型，且只能使用声明过的属性。
+            rollback: 若为 True，则自定义属性参与 Ren'Py 的回滚，回滚日志中只记录被修改的属性的旧值。回滚时不会触发任务与属性监听回调。
+
+        Examples:
+            ```
+            default e = AdvancedCharacter("艾琳", schema={"health": int, "love": (int, float)})
+            ```
         """
 
         name = name or renpy.character.NotSet
 
-        self.task_list: list[CharacterTask] = []
+        if rollback:
+            self._record = RollbackRecord(self, schema)
+        else:
+            self._record = record_class(schema)() if schema else None
+        self._groups: list[CharacterGroup] = []
+        self._observers: dict[str, list[tuple[Callable, bool]]] = {}   # 属性 -> (回调, 是否延迟)
+        self._deferred_changes: dict[str, list] = {}                  # 属性 -> [本条语句中的旧值, 最新值]
+        self._init_tasks()
         self.user_attrs = set()
         super().__init__(name=name, kind=kind, **properties)
 
+    def __setattr__(self, name, value):
+        if name not in self.user_attrs:
+            super().__setattr__(name, value)
+            return
+
+        old = getattr(self, name, MISSING)
+        record = self._record
+        if record is not None and record._declares(name):
+            setattr(record, name, value)
+        else:
+            super().__setattr__(name, value)
+
+        self._mark_dirty(name)
+        for group in self._groups:
+            group._member_changed(self, name, old, value)
+        if name in self._observers:
+            self._notify_observers(name, None if old is MISSING else old, value)
+
+    def observe(self, name: str, callback: Callable, deferred=False):
+        """调用该方法，监听一个自定义属性的修改。
+
+        回调以 `callback(character, name, old, new)` 的形式调用。回调会随角色对象一起写入存档，因此必须可以被序列化（如在 `init python` 中定义的函数）。
+
+        Args:
+            name: 要监听的自定义属性
+            callback: 回调函数
+            deferred: 若为 True，则回调推迟到当前语句结束时执行，同一条语句中的多次修改只触发一次，`old` 为语句开始前的值，`new` 为最终的值
+        """
+
+        if name not in self.user_attrs:
+            raise CharacterError(ChrErrorType.userAttrError)
+
+        self._observers.setdefault(name, []).append((callback, deferred))
+
+    def unobserve(self, name: str, callback: Callable):
+        """调用该方法，取消对一个自定义属性的监听。"""
+
+        observers = [observer for observer in self._observers.get(name, ()) if observer[0] != callback]
+        if observers:
+            self._observers[name] = observers
+        else:
+            self._observers.pop(name, None)
+
+    def _notify_observers(self, name, old, new):
+        deferred = False
+        for callback, is_deferred in self._observers[name]:
+            if is_deferred:
+                deferred = True
+            else:
+                callback(self, name, old, new)
+
+        if deferred:
+            if name in self._deferred_changes:
+                self._deferred_changes[name][1] = new
+            else:
+                self._deferred_changes[name] = [old, new]
+                scheduler.defer(self)
+
+    def _flush_observers(self):
+        """执行延迟的回调。"""
+
+        changes, self._deferred_changes = self._deferred_changes, {}
+        for name, (old, new) in changes.items():
+            for callback, is_deferred in self._observers.get(name, ()):
+                if is_deferred:
+                    callback(self, name, old, new)
+
+    @override
+    def __setstate__(self, state):
+        # 兼容没有属性监听功能、不属于任何角色组时的存档
+        state.setdefault("_groups", [])
+        state.setdefault("_observers", {})
+        # 旧版本存档中，角色组可能先于角色读取完毕，并已把自己登记到角色的 `_groups` 中
+        for group in self.__dict__.get("_groups", ()):
+            if group not in state["_groups"]:
+                state["_groups"].append(group)
+        state.setdefault("_deferred_changes", {})
+        state.setdefault("_record", None)
+        super().__setstate__(state)
+
+    def __getattr__(self, name):
+        # 只有在实例字典中找不到属性时才会调用，此时从属性记录中读取
+        record = self.__dict__.get("_record")
+        if record is not None and record._declares(name):
+            return getattr(record, name)
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def _attrs_reverted(self, names):
+        """自定义属性被回滚后，丢弃角色组中缓存的列。"""
+
+        for group in self._groups:
+            for name in names:
+                group._drop_column(name)
+
     def _emphasize(self, emphasize_callback, t, l):
         """使角色对象支持强调。"""
 
@@ -42,61 +162,223 @@ class AdvancedCharacter(ADVCharacter):
             raise CharacterError(ChrErrorType.imageTagError, self.name)
 
     def add_task(self, task: CharacterTask):
-        """调用该方法，绑定一个角色任务。"""   
+        """调用该方法，绑定一个角色任务。
+
+        任务只在其条件用到的自定义属性被重新赋值后才会被检查；条件中没有用到自定义属性的任务每条语句都会被检查。
+        """   
 
         if not task.required_attrs.issubset(self.user_attrs):
             raise CharacterError(ChrErrorType.userAttrError)
 
-        self.task_list.append(task)
-        if self._check_task not in config.python_callbacks:
-            config.python_callbacks.append(self._check_task)
+        self._bind_task(task)
 
     def set(self, **attrs):
-        """调用该方法，给该角色对象创建自定义的一系列属性。"""
+        """调用该方法，给该角色对象创建自定义的一系列属性。
+
+        注意：只有对属性重新赋值才会触发任务检查，原地修改可变对象（如 `list.append`）不会触发。
+        """
 
+        record = self._record
         for a, v in attrs.items():
+            if record is not None:
+                record._check(a, v)
             self.user_attrs.update({a: v})
             setattr(self, a, v)
 
     def _check_task(self):
         """该方法用于在更新自定义属性值时触发任务。"""
 
-        if not self.task_list:
-            return
-        
-        self.task_list.sort(key=lambda x: x.priority, reverse=True)
-
         satisfied_task: list[CharacterTask] = []
-        for task in self.task_list:
-            all_conditions_met = True
-            for condition in task.condition_list:
-                if not eval(condition, {"CHARACTER": self}):
-                    all_conditions_met = False
+        for task in self._take_candidates():
+            for predicate in task.predicate_list:
+                if not predicate(self):
                     break
+            else:
+                satisfied_task.append(task)
+
+        self._run_tasks(satisfied_task)
+
+
+class CharacterSet:
+    """保持加入顺序的角色集合。
+
+    以字典存储成员，成员判断、添加与删除均为 O(1)，且不会重复添加同一个角色。
+    同时缓存成员元组（供随机选择与按下标访问使用）和图像标签索引。
+    """
+
+    def __init__(self, characters: Iterable[AdvancedCharacter] = ()):
+        self._members: dict[int, AdvancedCharacter] = {}                # id(角色) -> 角色
+        self._tuple: tuple[AdvancedCharacter, ...] | None = None
+        self._tags: dict[str, list[AdvancedCharacter]] | None = None    # 图像标签 -> 角色
+
+        for character in characters:
+            self.add(character)
+
+    def add(self, character: AdvancedCharacter) -> bool:
+        """添加一个角色，返回是否为新成员。"""
+
+        key = id(character)
+        if key in self._members:
+            return False
+
+        self._members[key] = character
+        self._tuple = None
+        self._tags = None
+        return True
+
+    def remove(self, character: AdvancedCharacter):
+        """删除一个角色，角色不在集合中时引发 ValueError。"""
+
+        try:
+            del self._members[id(character)]
+        except KeyError:
+            raise ValueError(f"角色 `{character.name}` 不在角色组中！") from None
+
+        self._tuple = None
+        self._tags = None
+
+    def as_tuple(self) -> tuple[AdvancedCharacter, ...]:
+        if self._tuple is None:
+            self._tuple = tuple(self._members.values())
+        return self._tuple
+
+    def _tag_index(self) -> dict[str, list[AdvancedCharacter]]:
+        if self._tags is None:
+            tags = {}
+            for character in self._members.values():
+                if character.image_tag:
+                    tags.setdefault(character.image_tag, []).append(character)
+            self._tags = tags
+        return self._tags
+
+    def by_tag(self, image_tag: str) -> list[AdvancedCharacter]:
+        """返回绑定了该图像标签的成员。"""
 
-            if not all_conditions_met:
-                continue
+        return self._tag_index().get(image_tag, [])
 
-            satisfied_task.append(task)
+    def tags(self):
+        """返回成员绑定的所有图像标签（不重复）。"""
 
-        for task in satisfied_task:
-            for task_func in task.func_list:
-                task_func()
+        return self._tag_index().keys()
 
-            if task.single_use:
-                self.task_list.remove(task)
+    def __contains__(self, character):
+        return id(character) in self._members
 
+    def __iter__(self):
+        return iter(self._members.values())
 
-GROUP_INIT_FIELD = ("character_group", "task_list", "t", "l", "started")
+    def __len__(self):
+        return len(self._members)
 
+    def __getitem__(self, index):
+        return self.as_tuple()[index]
 
-class CharacterGroup:
-    """该类用于管理多个高级角色对象。"""
+    def __getstate__(self):
+        # 对象的 id 在读档后会改变，因此只保存成员列表
+        return list(self._members.values())
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+
+GROUP_INIT_FIELD = (
+    "character_group", "task_list", "t", "l", "started",
+    "_dirty_attrs", "_task_index", "_unchecked_tasks",
+    "_columns", "_arrays", "_rows", "_aggregates", "_transforms",
+)
+
+# 可以按数组求值的属性值类型
+NUMERIC_TYPES = frozenset({int, float, bool})
+
+# 仅用于缓存、不写入存档的字段
+GROUP_CACHE_FIELD = ("_columns", "_arrays", "_rows", "_transforms")
+
+
+class CharacterGroup(TaskOwner):
+    """该类用于管理多个高级角色对象。
+
+    检查任务时，条件按列求值：每个自定义属性对应一列，每个角色对应一行。
+    安装了 NumPy 且角色数不少于 `VECTORIZE_MIN_SIZE` 时，条件用到的列都是数字时直接作用于整列的数组：
+    全为浮点数的列转换为 float64 数组，运算与 Python 的浮点数一致，溢出、除以零等浮点错误会引发异常；
+    含有整数或布尔值的列转换为 object 数组，逐个元素使用 Python 的运算，不会像 int64 一样溢出回绕。
+    其他列、引发异常或结果不是逐行的数组的条件，退回逐行求值。
+    """
+
+    VECTORIZE = True
+    VECTORIZE_MIN_SIZE = 32
 
     def __init__(self, *characters: AdvancedCharacter):
-        self.character_group: list[AdvancedCharacter] = []
+        self.character_group = CharacterSet()
+        self._aggregates: dict[str, AttrAggregate] = {}    # 属性 -> 统计值，随角色组一起写入存档，以便读档后仍是同一个对象
+        self._init_tasks()
+        self._clear_columns()
         self.add_characters(*characters)
-        self.task_list: list[CharacterTask] = []
+
+    def _clear_columns(self):
+        self._columns: dict[str, list] = {}            # 属性 -> 各角色的属性值，顺序与 `character_group` 一致
+        self._arrays: dict[str, object] = {}           # 属性 -> 由列转换而来的 NumPy 数组，无法转换时为 None
+        self._rows: dict[int, int] | None = None       # id(角色) -> 行号
+        for aggregate in self._aggregates.values():
+            aggregate.reset()
+
+    def _column(self, attr: str) -> list:
+        column = self._columns.get(attr)
+        if column is None:
+            column = self._columns[attr] = [getattr(character, attr) for character in self.character_group]
+        return column
+
+    def _array(self, attr: str):
+        if attr in self._arrays:
+            return self._arrays[attr]
+
+        column = self._column(attr)
+        types = set(map(type, column))
+        if types <= {float}:
+            array = numpy.array(column, dtype=numpy.float64)
+        elif types <= NUMERIC_TYPES:
+            array = numpy.array(column, dtype=object)
+        else:
+            array = None
+        self._arrays[attr] = array
+        return array
+
+    def _update_array(self, attr: str, row: int, old, value):
+        """新值仍符合数组的类型时原地更新数组，否则丢弃数组，下次使用时重新转换。"""
+
+        array = self._arrays[attr]
+        if array is None:
+            # 该列之前无法转换，只有数字替换了非数字时才可能变为可以转换
+            if type(value) in NUMERIC_TYPES and type(old) not in NUMERIC_TYPES:
+                del self._arrays[attr]
+        elif type(value) is float or (array.dtype == numpy.object_ and type(value) in NUMERIC_TYPES):
+            array[row] = value
+        else:
+            del self._arrays[attr]
+
+    def _drop_column(self, attr: str):
+        self._columns.pop(attr, None)
+        self._arrays.pop(attr, None)
+        aggregate = self._aggregates.get(attr)
+        if aggregate is not None:
+            aggregate.reset()
+
+    def _member_changed(self, character: AdvancedCharacter, name: str, old, value):
+        """成员的自定义属性被修改时更新对应的列与统计值。"""
+
+        aggregate = self._aggregates.get(name)
+        if aggregate is not None:
+            aggregate.update(old, value)
+
+        column = self._columns.get(name)
+        if column is not None:
+            if self._rows is None:
+                self._rows = {id(member): row for row, member in enumerate(self.character_group)}
+            row = self._rows[id(character)]
+            column[row] = value
+            if name in self._arrays:
+                self._update_array(name, row, old, value)
+
+        self._mark_dirty(name)
 
     @staticmethod
     def  _check_type(obj):
@@ -106,12 +388,29 @@ class CharacterGroup:
             return
         raise CharacterError(ChrErrorType.typeError, type(obj).__name__)
 
+    def _join(self, character: AdvancedCharacter):
+        """登记一个新成员。"""
+
+        if not self.character_group.add(character):
+            return
+        character._groups.append(self)
+        self._clear_columns()
+        self._mark_all_dirty()
+
+    def _leave(self, character: AdvancedCharacter):
+        """移除一个成员。"""
+
+        self.character_group.remove(character)
+        character._groups.remove(self)
+        self._clear_columns()
+        self._mark_all_dirty()
+
     def add_characters(self, *characters: AdvancedCharacter):
         """调用该方法，向角色组中添加一个或多个角色对象。"""
 
         for character in characters:
             CharacterGroup._check_type(character)
-            self.character_group.append(character)
+            self._join(character)
          
     def get_random_character(self, rp=True):
         """调用该方法，返回角色组中随机一个角色对象。
@@ -122,14 +421,38 @@ class CharacterGroup:
 
         choice = renpy.random.choice if rp else random.choice
         
-        return choice(list(self.character_group))
+        return choice(self.character_group)
+
+    def _attr_values(self, name: str):
+        return (getattr(character, name) for character in self.character_group if name in character.user_attrs)
+
+    def aggregate(self, name: str) -> AttrAggregate:
+        """调用该方法，返回角色组中某个自定义属性的统计值。
+
+        统计值会被缓存，并随成员属性的修改增量更新，适合在每帧都会刷新的界面中使用。
+        同一属性总是返回同一个对象，成员变化、回滚或读档后该对象仍然有效。
+
+        Args:
+            name: 自定义属性名
+
+        Examples:
+            ```
+            $ health = party.aggregate("health")
+            text "总生命值：[health.sum] 平均生命值：[health.mean]"
+            ```
+        """
+
+        aggregate = self._aggregates.get(name)
+        if aggregate is None:
+            aggregate = self._aggregates[name] = AttrAggregate(partial(self._attr_values, name))
+        return aggregate
 
     def del_characters(self, *characters: AdvancedCharacter):
         """调用该方法，删除角色组中的一个或多个角色。"""
         
         for character in characters:
             CharacterGroup._check_type(character)
-            self.character_group.remove(character)
+            self._leave(character)
 
     def set(self, **kwargs):
         """调用该方法，对角色组中所有角色对象创建自定义的一系列属性。
@@ -154,47 +477,75 @@ class CharacterGroup:
     def add_task(self, task: CharacterTask):
         """调用该方法，给角色组添加一个任务，所有角色都满足条件才会触发。"""
 
-        self.task_list.append(task)
-        if self._check_task not in config.python_callbacks:
-            config.python_callbacks.append(self._check_task)
+        self._bind_task(task)
     
     def _check_task(self):
         """该方法用于在角色组中所有角色属性值更新时触发任务。"""
 
-        if not self.task_list:  
-            return
-        
-        self.task_list.sort(key=lambda x: x.priority, reverse=True)
-
         satisfied_task: list[CharacterTask] = []
-        for task in self.task_list:
-            all_conditions_met = True
-            for character in self.character_group:
-                for condition in task.condition_list:
-                    if not eval(condition, {"CHARACTER": character}):
-                        all_conditions_met = False
-                        break
-                
-                if not all_conditions_met:
+        for task in self._take_candidates():
+            for attrs, predicate in task.column_predicate_list:
+                if not self._all(attrs, predicate):
                     break
+            else:
+                satisfied_task.append(task)
+
+        self._run_tasks(satisfied_task)
+
+    def _all(self, attrs: tuple[str, ...], predicate) -> bool:
+        """判断角色组中所有角色是否都满足一个条件。"""
+
+        if not self.character_group:
+            return True
+        if not attrs:
+            return bool(predicate())
+
+        if self.VECTORIZE and numpy is not None and len(self.character_group) >= self.VECTORIZE_MIN_SIZE:
+            arrays = [self._array(attr) for attr in attrs]
+            if all(array is not None for array in arrays):
+                try:
+                    with numpy.errstate(all="raise"):
+                        result = predicate(*arrays)
+                except Exception:
+                    result = None
+                if (
+                    isinstance(result, numpy.ndarray)
+                    and result.dtype in (numpy.bool_, numpy.object_)
+                    and result.shape == (len(self.character_group),)
+                ):
+                    return bool(result.all())
+
+        return all(map(predicate, *(self._column(attr) for attr in attrs)))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for field in GROUP_CACHE_FIELD:
+            state.pop(field, None)
+        return state
 
-            if not all_conditions_met:
-                continue
-            
-            satisfied_task.append(task)
-
-        for task in satisfied_task:
-            for task_func in task.func_list:
-                task_func()
-
-            if task.single_use:
-                self.task_list.remove(task)
+    @override
+    def __setstate__(self, state):
+        if isinstance(state["character_group"], list):
+            # 兼容以列表保存成员时的存档
+            state["character_group"] = CharacterSet(state["character_group"])
+        # 任务以列表保存的存档中，角色还没有记录所属的角色组
+        legacy = isinstance(state["task_list"], list)
+        state.setdefault("_aggregates", {})
+        super().__setstate__(state)
+        self._clear_columns()
+
+        if legacy:
+            for character in self.character_group:
+                # 角色可能还没有读取完毕（例如角色的回调引用了角色组），此时直接写入其实例字典
+                groups = character.__dict__.setdefault("_groups", [])
+                if self not in groups:
+                    groups.append(self)
 
     def __getattr__(self, name):
         if name in GROUP_INIT_FIELD:
             return super().__getattribute__(name)
         else:
-            return (getattr(character, name) for character in self.character_group if name in character.user_attrs)
+            return self._attr_values(name)
     
     def __setattr__(self, name, value):
         if name in GROUP_INIT_FIELD:
@@ -218,8 +569,14 @@ class SpeakingGroup(CharacterGroup):
         self.t = t
         self.l = l
         self.started = True
+        self._transforms = {}   # (t, l) -> emphasize 变换
         super().__init__(*characters)
 
+    @override
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._transforms = {}
+
     def start(self):
         """调用该方法，开始进入发言强调状态。"""
 
@@ -235,39 +592,55 @@ class SpeakingGroup(CharacterGroup):
         for character in characters:
             CharacterGroup._check_type(character)
             character._emphasize(self.emphasize, self.t, self.l)    # 使角色支持强调
-            self.character_group.append(character)
+            self._join(character)
 
     @override
     def del_characters(self, *characters):
         for character in characters:
             CharacterGroup._check_type(character)
             character.display_args["callback"] = None
-            self.character_group.remove(character)
+            self._leave(character)
+
+    def _transform(self, t, l):
+        """返回缓存的 emphasize 变换。"""
+
+        transform = self._transforms.get((t, l))
+        if transform is None:
+            try:
+                from renpy.store import emphasize # type: ignore
+            except ImportError:
+                raise Exception("SpeakingGroup 需要 `speaking_group.rpy` 依赖，请确保依赖文件已存在于 `game/libs` 目录！")
+            transform = self._transforms[(t, l)] = emphasize(t, l)
+        return transform
+
+    @staticmethod
+    def _apply(image_tag, transform):
+        """若图像正在显示且没有应用该变换，则以该变换重新显示图像。"""
+
+        at_list = renpy.get_at_list(image_tag)
+        if at_list is None:     # 图像未显示
+            return
+        if any(applied is transform for applied in at_list):
+            return
+
+        renpy.show(image_tag, at_list=[transform])
 
     def emphasize(self, character: AdvancedCharacter, event, t=0.15, l=-0.3, **kwargs):
-        """该方法用于定义角色对象时作为回调函数使用。该方法可创建一个对话组，对话组中一个角色说话时，其他角色将变暗。"""            
+        """该方法用于定义角色对象时作为回调函数使用。该方法可创建一个对话组，对话组中一个角色说话时，其他角色将变暗。
+
+        只重新显示明暗状态需要改变的角色：是否需要改变由图像当前应用的变换判断，因此回滚、读档或以新的变换重新显示图像后也能保持正确。
+        """            
 
         if (not event == "begin") or (not self.started):
             return
 
         if character not in self.character_group:
             self.add_characters(character)
-        
-        image = renpy.get_say_image_tag()
-        try:
-            from renpy.store import emphasize # type: ignore
-        except ImportError:
-            raise Exception("SpeakingGroup 需要 `speaking_group.rpy` 依赖，请确保依赖文件已存在于 `game/libs` 目录！")
-
-        if renpy.showing(character.image_tag):
-            renpy.show(
-                image, 
-                at_list=[emphasize(t, 0)]
-            )
-        
-        for speaker in self.character_group:
-            if speaker != character and renpy.showing(speaker.image_tag):
-                renpy.show(
-                    speaker.image_tag, 
-                    at_list=[emphasize(t, l)]
-                )
+
+        SpeakingGroup._apply(character.image_tag, self._transform(t, 0))
+
+        # 按图像标签遍历，多个成员共用同一图像标签时只处理一次
+        dimmed = self._transform(t, l)
+        for image_tag in self.character_group.tags():
+            if image_tag != character.image_tag:
+                SpeakingGroup._apply(image_tag, dimmed)
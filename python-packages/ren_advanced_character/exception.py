@@ -6,6 +6,8 @@ class ChrErrorType(Enum):
     imageTagError = "图像标签错误，请检查角色 `{}` 是否绑定了图像标签！"
     handlerError = "handler参数 必须为 `jump` 或 `call`，而非 `{}`！"
     userAttrError = "要绑定的人物中使用了不存在的角色属性！"
+    undeclaredAttrError = "角色属性 `{}` 不在声明的属性结构中！"
+    attrTypeError = "角色属性 `{}` 的类型应为 `{}`，而非 `{}`！"
 
 
 class CharacterError(Exception):
@@ -0,0 +1,164 @@
+# 描述  角色属性记录类
+# 作者  ZYKsslm
+# 仓库  https://github.com/ZYKsslm/RenPyUtil
+# 声明  该源码使用 MIT 协议开源，但若使用需要在程序中标明作者信息
+
+
+from .exception import ChrErrorType, CharacterError
+
+from renpy.revertable import RevertableObject, mutator # type: ignore
+
+
+class _Missing:
+    """表示记录中尚未赋值的属性。"""
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "MISSING"
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def check_value(schema: dict[str, type | tuple[type, ...]], name: str, value):
+    """检查属性是否已声明、值的类型是否正确。"""
+
+    expected = schema.get(name)
+    if expected is None:
+        raise CharacterError(ChrErrorType.undeclaredAttrError, name)
+    if not isinstance(value, expected):
+        raise CharacterError(ChrErrorType.attrTypeError, name, _type_name(expected), type(value).__name__)
+
+
+class CharacterRecord:
+    """按声明的属性结构紧凑存储角色自定义属性的记录。
+
+    每种属性结构对应一个使用 `__slots__` 的子类，由 `record_class` 创建并缓存。
+    赋值时检查类型；写入存档时只保存属性结构与各属性值。
+    """
+
+    __slots__ = ()
+
+    _fields: tuple[tuple[str, type | tuple[type, ...]], ...] = ()
+    _schema: dict[str, type | tuple[type, ...]] = {}
+
+    @classmethod
+    def _declares(cls, name: str) -> bool:
+        return name in cls._schema
+
+    @classmethod
+    def _check(cls, name: str, value):
+        check_value(cls._schema, name, value)
+
+    def __setattr__(self, name, value):
+        check_value(self._schema, name, value)
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        return _rebuild_record, (self._fields, tuple(getattr(self, name, MISSING) for name in self.__slots__))
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name, MISSING)!r}" for name in self.__slots__)
+        return f"<{type(self).__name__} {values}>"
+
+
+_record_classes: dict[tuple, type[CharacterRecord]] = {}
+
+
+def record_class(schema: dict[str, type | tuple[type, ...]]) -> type[CharacterRecord]:
+    """返回属性结构对应的记录类。
+
+    Args:
+        schema: 属性名 -> 类型（或类型元组）
+    """
+
+    fields = tuple(schema.items())
+    cls = _record_classes.get(fields)
+    if cls is None:
+        cls = _record_classes[fields] = type("CharacterRecord", (CharacterRecord,), {
+            "__slots__": tuple(schema),
+            "_fields": fields,
+            "_schema": dict(fields),
+        })
+    return cls
+
+
+def _rebuild_record(fields, values):
+    record = record_class(dict(fields))()
+    for (name, _), value in zip(fields, values):
+        if value is not MISSING:
+            object.__setattr__(record, name, value)
+    return record
+
+
+class RollbackRecord(RevertableObject):
+    """参与 Ren'Py 回滚的角色自定义属性记录。
+
+    回滚日志中不保存整个记录，而是在每个检查点中第一次修改某个属性时记下它的旧值，
+    回滚时只恢复这些属性，因此回滚占用的内存只与修改的次数有关。
+    """
+
+    def __init__(self, owner, schema: dict[str, type | tuple[type, ...]] | None = None):
+        super().__init__()
+        object.__setattr__(self, "_owner", owner)
+        object.__setattr__(self, "_schema", dict(schema) if schema else None)
+        object.__setattr__(self, "_values", {})
+        object.__setattr__(self, "_undo", {})     # 当前检查点中被修改的属性 -> 修改前的值
+
+    def _declares(self, name: str) -> bool:
+        return self._schema is None or name in self._schema
+
+    def _check(self, name: str, value):
+        if self._schema is not None:
+            check_value(self._schema, name, value)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["_values"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @mutator
+    def __setattr__(self, name, value):
+        self._check(name, value)
+        if name not in self._undo:
+            self._undo[name] = self._values.get(name, MISSING)
+        self._values[name] = value
+
+    def _clean(self):
+        # 每个检查点中第一次修改时调用，返回的字典会在之后的修改中被填充
+        undo = {}
+        object.__setattr__(self, "_undo", undo)
+        return undo
+
+    def _compress(self, clean):
+        return clean
+
+    def _rollback(self, compressed):
+        for name, value in compressed.items():
+            if value is MISSING:
+                self._values.pop(name, None)
+            else:
+                self._values[name] = value
+
+        self._owner._attrs_reverted(compressed)
+
+    def __getstate__(self):
+        return {"_owner": self._owner, "_schema": self._schema, "_values": self._values}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__dict__["_undo"] = {}
+
+    def __repr__(self):
+        return f"<RollbackRecord {self._values!r}>"
+
+
+def _type_name(expected):
+    if isinstance(expected, tuple):
+        return " | ".join(t.__name__ for t in expected)
+    return expected.__name__
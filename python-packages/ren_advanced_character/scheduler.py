@@ -0,0 +1,169 @@
+# 描述  任务调度相关类
+# 作者  ZYKsslm
+# 仓库  https://github.com/ZYKsslm/RenPyUtil
+# 声明  该源码使用 MIT 协议开源，但若使用需要在程序中标明作者信息
+
+
+import weakref
+
+from abc import ABC, abstractmethod
+
+from .task import CharacterTask, TaskQueue
+
+import renpy.config as config  # type: ignore
+
+
+class TaskScheduler:
+    """全局任务调度器。
+
+    所有角色与角色组共用同一个 `config.python_callbacks` 回调，每条语句只检查有待处理工作的对象：
+    自定义属性被修改过、刚绑定了任务，或拥有不依赖自定义属性的任务。
+    延迟执行的属性监听回调也在该回调中、检查任务之前执行。
+    """
+
+    def __init__(self):
+        self._pending: dict[int, "TaskOwner"] = {}
+        self._deferred: dict[int, "TaskOwner"] = {}
+        self._watched: weakref.WeakValueDictionary[int, "TaskOwner"] = weakref.WeakValueDictionary()
+
+    def notify(self, owner: "TaskOwner"):
+        """在下一次检查时检查该对象。"""
+
+        self._register()
+        self._pending[id(owner)] = owner
+
+    def defer(self, owner: "TaskOwner"):
+        """在当前语句结束时执行该对象延迟的属性监听回调。"""
+
+        if not self._deferred:
+            self._register()
+        self._deferred[id(owner)] = owner
+
+    def watch(self, owner: "TaskOwner"):
+        """每次检查时都检查该对象，用于拥有不依赖自定义属性的任务的对象。"""
+
+        self._register()
+        self._watched[id(owner)] = owner
+
+    def unwatch(self, owner: "TaskOwner"):
+        self._watched.pop(id(owner), None)
+
+    def check(self):
+        """检查所有有待处理工作的对象。"""
+
+        if self._deferred:
+            deferred, self._deferred = self._deferred, {}
+            for owner in deferred.values():
+                owner._flush_observers()
+
+        if not self._pending and not self._watched:
+            return
+
+        owners, self._pending = self._pending, {}
+        for key, owner in list(self._watched.items()):
+            owners.setdefault(key, owner)
+
+        for owner in owners.values():
+            owner._check_task()
+
+    def _register(self):
+        # 每次都确认回调仍在列表中，以免重新加载脚本后 `config.python_callbacks` 被重置
+        if self.check not in config.python_callbacks:
+            config.python_callbacks.append(self.check)
+
+
+scheduler = TaskScheduler()
+
+
+class TaskOwner(ABC):
+    """绑定任务的对象（角色与角色组）的公共逻辑。
+
+    维护自定义属性到任务的索引，记录被修改过的属性，并把需要检查的对象交给全局调度器。
+    子类实现 `_check_task`，由调度器在需要检查时调用。
+    """
+
+    def _init_tasks(self):
+        self.task_list = TaskQueue()
+        self._dirty_attrs: set[str] = set()                     # 自上次检查任务以来被修改过的自定义属性
+        self._task_index: dict[str, list[CharacterTask]] = {}  # 自定义属性 -> 依赖该属性的任务
+        self._unchecked_tasks: list[CharacterTask] = []        # 新绑定的任务及不依赖自定义属性的任务，下次检查时无条件检查
+
+    def _bind_task(self, task: CharacterTask):
+        # 重复绑定同一个任务时忽略，以免索引中出现重复的条目
+        if task in self.task_list:
+            return
+
+        self.task_list.add(task)
+        for attr in task.required_attrs:
+            self._task_index.setdefault(attr, []).append(task)
+        self._unchecked_tasks.append(task)
+
+        scheduler.notify(self)
+        if not task.required_attrs:
+            scheduler.watch(self)
+
+    def _unbind_task(self, task: CharacterTask):
+        self.task_list.remove(task)
+        for attr in task.required_attrs:
+            self._task_index[attr].remove(task)
+            if not self._task_index[attr]:
+                del self._task_index[attr]
+
+        if task in self._unchecked_tasks:
+            self._unchecked_tasks.remove(task)
+        if not self._unchecked_tasks:
+            scheduler.unwatch(self)
+
+    def _mark_dirty(self, attr: str):
+        """记录一次自定义属性的修改。"""
+
+        if attr in self._task_index:
+            self._dirty_attrs.add(attr)
+            scheduler.notify(self)
+
+    def _mark_all_dirty(self):
+        """下次检查时检查所有任务。"""
+
+        if self._task_index:
+            self._dirty_attrs.update(self._task_index)
+            scheduler.notify(self)
+
+    def _take_candidates(self) -> list[CharacterTask]:
+        """取出本次需要检查的任务，按优先级排列。"""
+
+        candidates = set(self._unchecked_tasks)
+        self._unchecked_tasks = [task for task in self._unchecked_tasks if not task.required_attrs]
+        if self._dirty_attrs:
+            dirty_attrs, self._dirty_attrs = self._dirty_attrs, set()
+            for attr in dirty_attrs:
+                candidates.update(self._task_index.get(attr, ()))
+
+        return self.task_list.ordered(candidates)
+
+    def _run_tasks(self, satisfied_task: list[CharacterTask]):
+        for task in satisfied_task:
+            for task_func in task.func_list:
+                task_func()
+
+            if task.single_use:
+                self._unbind_task(task)
+
+    @abstractmethod
+    def _check_task(self):
+        """检查 `_take_candidates` 取出的任务，并执行满足条件的任务。"""
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+        if not isinstance(self.task_list, TaskQueue):
+            # 兼容任务以列表保存、没有任务索引时的存档：重新绑定所有任务，下次检查时全部检查一遍
+            tasks = self.task_list
+            self._init_tasks()
+            for task in tasks:
+                self._bind_task(task)
+
+        # 读档后重新登记到全局调度器中
+        if self._unchecked_tasks:
+            scheduler.notify(self)
+        if any(not task.required_attrs for task in self._unchecked_tasks):
+            scheduler.watch(self)
@@ -6,12 +6,34 @@
 
 import re
 
-from typing import Callable
+from typing import Callable, Iterable
 from functools import partial
 
 import renpy.exports as renpy # type: ignore
 
 
+def compile_condition(condition: str) -> Callable:
+    """把条件表达式编译为一个以角色对象 `CHARACTER` 为参数的函数。"""
+
+    return eval(f"lambda CHARACTER: ({condition})", {})
+
+
+def compile_column_condition(condition: str) -> tuple[tuple[str, ...], Callable]:
+    """把条件表达式编译为一个按列求值的函数。
+
+    函数的参数依次为条件中用到的各个属性（`ATTR_<属性名>`），可以逐个角色调用，也可以直接传入整列的 NumPy 数组。
+
+    Returns:
+        条件中用到的属性名与编译后的函数。
+    """
+
+    attrs = tuple(dict.fromkeys(re.findall(r"CHARACTER\.(\w+)", condition)))
+    column = re.sub(r"CHARACTER\.(\w+)", r"ATTR_\1", condition)
+    params = ", ".join(f"ATTR_{attr}" for attr in attrs)
+
+    return attrs, eval(f"lambda {params}: ({column})", {})
+
+
 class CharacterTask:
     """该类为角色任务类，用于高级角色对象绑定任务。"""        
 
@@ -26,6 +48,8 @@ class CharacterTask:
         self.single_use = single_use
         self.priority = priority
         self.condition_list: list[str] = []
+        self.predicate_list: list[Callable] = []
+        self.column_predicate_list: list[tuple[tuple[str, ...], Callable]] = []
         self.func_list = []
 
         self.required_attrs = set()
@@ -46,6 +70,8 @@ class CharacterTask:
         args = re.findall(r"\{(\w+)\}", exp)
 
         condition = exp.format_map({arg: f"CHARACTER.{arg}" for arg in args})
+        self.predicate_list.append(compile_condition(condition))
+        self.column_predicate_list.append(compile_column_condition(condition))
         self.condition_list.append(condition)
         self.required_attrs.update(args)
 
@@ -66,4 +92,66 @@ class CharacterTask:
             ```
         """        
 
-        self.func_list.append(partial(func, *args, **kwargs))
\ No newline at end of file
+        self.func_list.append(partial(func, *args, **kwargs))
+
+    def __getstate__(self):
+        # 编译后的函数无法被序列化，读档时由条件表达式重新编译
+        state = self.__dict__.copy()
+        del state["predicate_list"]
+        del state["column_predicate_list"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.predicate_list = [compile_condition(condition) for condition in self.condition_list]
+        self.column_predicate_list = [compile_column_condition(condition) for condition in self.condition_list]
+
+
+class TaskQueue:
+    """按优先级排序的任务容器。
+
+    每个任务在添加时记录排序键 `(-优先级, 添加序号)`（优先级高者在前，优先级相同时按添加顺序），
+    添加和删除都是 O(1)。检查任务时只对候选任务按键排序；
+    遍历整个队列时才对全部任务排序，结果缓存到队列下次变化为止。
+    任务的优先级以添加时为准。
+    """
+
+    def __init__(self, tasks: Iterable[CharacterTask] = ()):
+        self._key_of: dict[CharacterTask, tuple[int, int]] = {}
+        self._seq = 0
+        self._order: list[CharacterTask] | None = None
+
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task: CharacterTask):
+        """添加一个任务。"""
+
+        if task in self._key_of:
+            return
+
+        self._key_of[task] = (-task.priority, self._seq)
+        self._seq += 1
+        self._order = None
+
+    def remove(self, task: CharacterTask):
+        """删除一个任务。"""
+
+        del self._key_of[task]
+        self._order = None
+
+    def ordered(self, tasks: Iterable[CharacterTask]) -> list[CharacterTask]:
+        """按队列中的顺序排列给定的任务。"""
+
+        return sorted(tasks, key=self._key_of.__getitem__)
+
+    def __contains__(self, task):
+        return task in self._key_of
+
+    def __iter__(self):
+        if self._order is None:
+            self._order = self.ordered(self._key_of)
+        return iter(self._order)
+
+    def __len__(self):
+        return len(self._key_of)
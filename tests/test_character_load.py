@@ -0,0 +1,108 @@
+# 描述  ren_advanced_character 读档兼容性测试
+# 作者  ZYKsslm
+# 仓库  https://github.com/ZYKsslm/RenPyUtil
+# 声明  该源码使用 MIT 协议开源，但若使用需要在程序中标明作者信息
+
+"""读取由旧版本（任务以列表保存、没有任务索引与角色组记录）写入的存档。
+
+与基准测试一样使用 `benchmarks/bench_task_engine.py` 中的 `renpy` 替身，无需 Ren'Py 环境。
+"""
+
+
+import sys
+import pickle
+
+import pytest
+
+from pathlib import Path
+from functools import partial
+
+if sys.version_info < (3, 12):
+    pytest.skip("ren_advanced_character 需要 Python 3.12 及以上版本", allow_module_level=True)
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "python-packages"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_task_engine import install_renpy_stub
+
+config = install_renpy_stub()
+
+from ren_advanced_character import AdvancedCharacter, CharacterTask, SpeakingGroup, TaskQueue
+
+
+fired = []
+
+
+def on_fire(name):
+    fired.append(name)
+
+
+def make_task(condition: str, name: str):
+    # 任务写入存档的状态只有条件表达式，与旧版本相同
+    task = CharacterTask()
+    task.add_condition(condition)
+    task.add_func(on_fire, name)
+    return task
+
+
+def legacy_character(name: str, **attrs):
+    """按旧版本的实例字典创建角色：任务以列表保存，没有任务索引与角色组记录。"""
+
+    character = AdvancedCharacter.__new__(AdvancedCharacter)
+    character.__dict__.update({
+        "name": name,
+        "image_tag": name,
+        "display_args": {},
+        "properties": {},
+        "task_list": [make_task("{hp} < 50", name)],
+        "user_attrs": set(attrs),
+        **attrs,
+    })
+    return character
+
+
+def legacy_group(*characters):
+    group = SpeakingGroup.__new__(SpeakingGroup)
+    group.__dict__.update({
+        "character_group": list(characters),
+        "task_list": [make_task("{hp} < 10", "group")],
+        "t": 0.15,
+        "l": -0.3,
+        "started": True,
+    })
+    # 与旧版本一样，角色的回调引用角色组，因此先写入存档的角色会在角色组读取完毕前引用它
+    for character in characters:
+        character.display_args["callback"] = partial(group.emphasize, character, t=0.15, l=-0.3)
+    return group
+
+
+def run_statement():
+    for callback in config.python_callbacks:
+        callback()
+
+
+@pytest.mark.parametrize("order", [("a", "b", "g"), ("g", "a", "b")])
+def test_load_legacy_save(order):
+    a = legacy_character("a", hp=100)
+    b = legacy_character("b", hp=100)
+    objects = {"a": a, "b": b, "g": legacy_group(a, b)}
+
+    loaded = pickle.loads(pickle.dumps({name: objects[name] for name in order}))
+    a, b, group = loaded["a"], loaded["b"], loaded["g"]
+
+    assert isinstance(a.task_list, TaskQueue) and len(a.task_list) == 1
+    assert a._groups == [group] and b._groups == [group]
+    assert list(group.character_group) == [a, b]
+
+    fired.clear()
+    run_statement()
+    assert fired == []
+
+    a.hp = 5
+    run_statement()
+    assert fired == ["a"]
+
+    b.hp = 5
+    run_statement()
+    assert fired == ["a", "b", "group"]